@@ -1,46 +1,66 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, make_response
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, send_from_directory, make_response, g, Response, stream_with_context, url_for
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
-import requests, time, os, hashlib
-import google.generativeai as genai
-from datetime import datetime, timedelta
-from collections import defaultdict
+import requests, time, os, json, itertools, sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
 from dotenv import load_dotenv
 
 from src.config import Config
-from src.services.codeforces import CodeforcesService
-from src.services.analyzer import SubmissionAnalyzer
+from src import cache as cache_backends  # registers the sqlite:// limiter storage
+from src.services.codeforces import CodeforcesService, lazy_class_attribute, lazy_singleton
+from src.services.analyzer import ActivityRollup, SubmissionAnalyzer
+from src.services.jobs import JobQueue, DONE, FAILED, QUEUED
+from src.services.problemset import ProblemsetIndex
+from src.services.ratelimit import CostLedger
+from src.services.recommender import ProblemRecommender
+from src.services.results import AnalysisEntry, AnalysisResult, negotiate
+from src.services.topics import topic_registry
+from src.services.tracing import MetricsStore, SamplingProfiler, render_prometheus, span, traced, tracer
 
-# Setup Flask app
+# Routes and extensions are bound to an app in create_app()
 load_dotenv()
-app = Flask(__name__)
-app.config.from_object(Config)
-app.config['SECRET_KEY'] = os.urandom(24)
+bp = Blueprint('main', __name__)
 
 cache = Cache(config={
     'CACHE_TYPE': Config.CACHE_TYPE,
-    'CACHE_DEFAULT_TIMEOUT': Config.CACHE_DEFAULT_TIMEOUT
+    'CACHE_DEFAULT_TIMEOUT': Config.CACHE_DEFAULT_TIMEOUT,
+    'CACHE_SQLITE_PATH': Config.CACHE_SQLITE_PATH,
+    'CACHE_THRESHOLD': Config.CACHE_THRESHOLD
 })
-cache.init_app(app)
 
 limiter = Limiter(
-    app=app,
     key_func=get_remote_address,
     default_limits=[Config.RATELIMIT_DEFAULT],
     storage_uri=Config.RATELIMIT_STORAGE_URL
 )
+cost_ledger = CostLedger(Config.RATELIMIT_HIT_COST, Config.RATELIMIT_MISS_COST)
 
-# Initialize services
-codeforces_service = CodeforcesService()
-submission_analyzer = SubmissionAnalyzer()
+# Services are built on first use, so importing the app starts no threads and opens no files
+@lazy_singleton
+def get_problemset_index():
+    index = ProblemsetIndex(client=CodeforcesService.client, ttl=Config.PROBLEMSET_TTL,
+                            snapshot_path=Config.PROBLEMSET_SNAPSHOT,
+                            bundled_snapshot_path=Config.PROBLEMSET_SNAPSHOT_BUNDLED)
+    # A cold instance serves suggestions from the newer snapshot; a stale one is refreshed in the background
+    index.load_snapshot()
+    return index
 
-# Configure Google Gemini AI
-genai.configure(api_key=Config.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+@lazy_singleton
+def get_executor(name):
+    workers = {'refresh': Config.ANALYSIS_REFRESH_WORKERS, 'batch': Config.BATCH_WORKERS}[name]
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+# Google Gemini AI; google.generativeai is slow to import, so it is loaded on first use
+@lazy_singleton
+def get_model():
+    import google.generativeai as genai
+    genai.configure(api_key=Config.GEMINI_API_KEY)
+    return genai.GenerativeModel('gemini-1.5-flash')
 
 # Serve static files through Flask routes
-@app.route('/static/<path:path>')
+@bp.route('/static/<path:path>')
 def send_static(path):
     # Obfuscate JavaScript files
     if path.endswith('.js'):
@@ -48,7 +68,7 @@ def send_static(path):
     return send_from_directory('static', path)
 
 # CORS headers for Vercel
-@app.after_request
+@bp.after_app_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
@@ -63,9 +83,27 @@ def security_headers(response):
     response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline' cdn.tailwindcss.com cdn.jsdelivr.net; style-src 'self' fonts.googleapis.com 'unsafe-inline'; img-src 'self' data: https:;"
     return response
 
-app.after_request(security_headers)
+bp.after_app_request(security_headers)
+
+# Opt-in sampling profile of a single request
+@bp.before_app_request
+def start_profiler():
+    token = request.headers.get('X-Profile-Token')
+    if Config.PROFILING_TOKEN and token == Config.PROFILING_TOKEN:
+        g.profiler = SamplingProfiler(interval=Config.PROFILING_INTERVAL).start()
+
+@bp.after_app_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profile = make_response(profiler.stop().collapsed(), 200)
+    profile.mimetype = 'text/plain'
+    profile.headers['X-Profiled-Status'] = str(response.status_code)
+    return profile
 
-def get_problem_suggestions(topic, user_rating, count=3):
+@traced('get_problem_suggestions')
+def get_problem_suggestions(topic, user_rating, count=3, recommender=None):
     try:
         difficulty = CodeforcesService.get_difficulty_level(user_rating)
         rating_ranges = {
@@ -75,63 +113,48 @@ def get_problem_suggestions(topic, user_rating, count=3):
         }
         min_rating, max_rating = rating_ranges[difficulty]
 
-        problems = cache.get(f'problems_{topic}_{min_rating}_{max_rating}')
-        if not problems:
-            response = requests.get('https://codeforces.com/api/problemset.problems').json()
-            if response['status'] == 'OK':
-                problems = [p for p in response['result']['problems']
-                          if 'rating' in p and min_rating <= p['rating'] <= max_rating]
-                cache.set(f'problems_{topic}_{min_rating}_{max_rating}', problems, timeout=3600)
-            else:
-                problems = []
+        problemset_index = get_problemset_index()
+        problemset_index.ensure_loaded()
+        recommender = recommender or ProblemRecommender(problemset_index, user_rating)
+        problems = recommender.top(topic, min_rating, max_rating, count)
 
         suggested = []
         for problem in problems:
-            if ('tags' in problem and topic.lower() in [t.lower() for t in problem.get('tags', [])]):
-                suggested.append({
-                    'platform': 'Codeforces',
-                    'name': problem.get('name', 'Unnamed'),
-                    'difficulty': problem.get('rating', 'Unknown'),
-                    'url': f"https://codeforces.com/problemset/problem/{problem.get('contestId')}/{problem.get('index')}"
-                })
-            if len(suggested) >= count:
-                break
+            suggested.append({
+                'platform': 'Codeforces',
+                'name': problem.get('name', 'Unnamed'),
+                'difficulty': problem.get('rating', 'Unknown'),
+                'url': f"https://codeforces.com/problemset/problem/{problem.get('contestId')}/{problem.get('index')}"
+            })
         
         return suggested
     except Exception as e:
         print(f"Error fetching problems: {e}")
         return []
 
-def generate_training_path(topics, user_rating):
-    # Sort topics by success rate and complexity
-    topic_difficulties = {
-        'implementation': 1,
-        'math': 2,
-        'greedy': 3,
-        'dp': 4,
-        'graphs': 5,
-        'data structures': 3,
-        'binary search': 2,
-        'strings': 2,
-        'number theory': 4,
-        'combinatorics': 4,
-        'geometry': 5
-    }
-    
+@traced('generate_training_path')
+def generate_training_path(topics, user_rating, solved=()):
+    # Sort topics by success rate and complexity; difficulty comes from the
+    # problemset statistics rebuilt on every refresh, else from the topic registry
+    problemset_index = get_problemset_index()
+    statistics = problemset_index.statistics
     weighted_topics = []
     for topic, stats in topics.items():
-        if topic.lower() == '*special problems':
+        if topic_registry.is_excluded(topic):
             continue
         success_rate = stats['solved'] / (stats['solved'] + stats['attempted']) if stats['solved'] + stats['attempted'] > 0 else 0
-        topic_difficulty = topic_difficulties.get(topic.lower(), 3)
+        topic_difficulty = statistics.difficulty(topic, default=topic_registry.difficulty(topic))
         weighted_topics.append((topic, success_rate, topic_difficulty))
     
     # Sort by topic difficulty and then by success rate
     weighted_topics.sort(key=lambda x: (x[2], x[1]))
     path = []
     
+    # One recommender per user: its solved bitmap and topic weights are shared by every topic
+    recommender = ProblemRecommender(problemset_index, user_rating, solved,
+                                     ProblemRecommender.weakness_from_topics(topics))
     for topic, rate, difficulty in weighted_topics[:5]:
-        suggested_problems = get_problem_suggestions(topic, user_rating)
+        suggested_problems = get_problem_suggestions(topic, user_rating, recommender=recommender)
         cp_resources = CodeforcesService.get_cp_resources(topic)
         
         path.append({
@@ -153,91 +176,476 @@ def generate_training_path(topics, user_rating):
     return path
 
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/favicon.ico')
+@bp.route('/favicon.ico')
 def favicon():
-    return send_from_directory(os.path.join(app.root_path, 'static'),
+    return send_from_directory(os.path.join(current_app.root_path, 'static'),
                              'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
-@app.route('/static/<path:filename>')
+@bp.route('/static/<path:filename>')
 def serve_static(filename):
     return send_from_directory('static', filename)
 
-@app.route('/analyze', methods=['POST'])
-@limiter.limit("30 per hour")
+def normalize_username(username):
+    # Codeforces handles are case-insensitive
+    return (username or '').strip().lower()
+
+def build_analysis(username, user_info=None):
+    # Load the problemset alongside the user fetch instead of after it
+    problemset_future = CodeforcesService.client.executor.submit(get_problemset_index().ensure_loaded)
+    with span('codeforces.get_user_analysis_state'):
+        cf_data = CodeforcesService.get_user_analysis_state(username, user_info)
+    if not cf_data:
+        return None
+    with span('problemset.ensure_loaded'):
+        problemset_future.result()
+
+    user_rating = cf_data['user_info'].get('rating', 0)
+    state = cf_data['state']
+    topics = state.analyze_submissions()
+    monthly_activity = state.analyze_monthly_activity()
+    statistics = state.calculate_statistics()
+    training_path = generate_training_path(topics, user_rating, state.solved)
+    recommendations = SubmissionAnalyzer.generate_recommendations(topics)
+
+    return {
+        'user_info': cf_data['user_info'],
+        'topics': topics,
+        'monthly_activity': monthly_activity,
+        'statistics': statistics,
+        'training_path': training_path,
+        'recommendations': recommendations
+    }
+
+def analysis_cache_key(username):
+    return f"user_analysis_{username}"
+
+def analysis_body_key(username, name, encoding=None):
+    return f"{analysis_cache_key(username)}_{name}_{encoding or 'identity'}"
+
+def encoded_response(username, name, entry):
+    # Bodies were encoded and compressed when the result was cached; read only
+    # the variant being sent. None if it has been evicted since.
+    etag = entry.etags[name]
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        encoding = negotiate(entry.encodings, request.accept_encodings)
+        body = cache.get(analysis_body_key(username, name, encoding))
+        if body is None:
+            return None
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def store_analysis(username, data):
+    # Entries stay servable until the hard TTL; past the soft TTL they are refreshed in the background.
+    # The entry is written after the bodies, so a visible entry has all of them.
+    result = AnalysisResult(data)
+    cache.set_many({analysis_body_key(username, name, encoding): body
+                    for (name, encoding), body in result.bodies().items()}, timeout=Config.ANALYSIS_HARD_TTL)
+    cache.set(analysis_cache_key(username), result.entry(), timeout=Config.ANALYSIS_HARD_TTL)
+    return result
+
+def refresh_analysis(username):
+    try:
+        result = build_analysis(username)
+        if result:
+            store_analysis(username, result)
+    except Exception as e:
+        print(f"Error refreshing analysis for {username}: {e}")
+    finally:
+        cache.delete(f"{analysis_cache_key(username)}_refresh")
+
+def get_cached_analysis(username):
+    entry = cache.get(analysis_cache_key(username))
+    if not isinstance(entry, AnalysisEntry):
+        return None
+    if time.time() - entry.created > Config.ANALYSIS_SOFT_TTL:
+        # cache.add is atomic across workers, so only one refresh runs per key
+        if cache.add(f"{analysis_cache_key(username)}_refresh", True, timeout=Config.ANALYSIS_REFRESH_TIMEOUT):
+            get_executor('refresh').submit(refresh_analysis, username)
+            start_codeforces_work()
+    return entry
+
+def analyze_batch(usernames):
+    """Return an iterator of (username, body, error) for each handle, each
+    yielded as soon as it is ready; body is the encoded /analyze JSON.
+
+    The cache is read on the call, so the handles to fetch are known before
+    anything is streamed. Cached analyses are yielded first. user.info for
+    all the others is fetched in batched calls, and their user.status syncs
+    run on the bounded batch pool. The problemset index is shared by all
+    handles."""
+    cached, pending = [], []
+    for username in dict.fromkeys(normalize_username(u) for u in usernames):
+        if not username:
+            continue
+        body = get_cached_analysis(username) and cache.get(analysis_body_key(username, 'analyze'))
+        if body:
+            cached.append((username, body, None))
+        else:
+            pending.append(username)
+    start_codeforces_work(len(pending))
+    return itertools.chain(cached, fetch_batch(pending))
+
+def fetch_batch(pending):
+    if not pending:
+        return
+
+    problemset_future = CodeforcesService.client.executor.submit(get_problemset_index().ensure_loaded)
+    try:
+        users = CodeforcesService.get_users_info(pending)
+        problemset_future.result()
+    except Exception as e:
+        # Every uncached handle needs both; report the failure once per handle
+        for username in pending:
+            yield username, None, str(e)
+        return
+    futures = {}
+    for username in pending:
+        if username in users:
+            futures[get_executor('batch').submit(build_analysis, username, users[username])] = username
+        else:
+            yield username, None, 'Invalid Codeforces username'
+    for future in as_completed(futures):
+        username = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            yield username, None, str(e)
+            continue
+        if result:
+            yield username, store_analysis(username, result).analyze.identity, None
+        else:
+            yield username, None, 'Invalid Codeforces username'
+
+def rating_cache_key(username):
+    return f"rating_{username}"
+
+def activity_cache_key(username):
+    return f"activity_{username}"
+
+def request_usernames():
+    if request.method != 'POST':
+        return [request.args.get('username')]
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return []
+    if 'usernames' not in data:
+        return [data.get('username')]
+    usernames = data['usernames']
+    # The view rejects these batches, so they are priced at 0
+    if not isinstance(usernames, list) or len(usernames) > Config.BATCH_MAX_HANDLES \
+            or not all(isinstance(u, str) for u in usernames):
+        return []
+    return usernames
+
+def analysis_is_fresh(username):
+    # A soft-stale hit schedules a refresh, so it is priced as a miss
+    entry = cache.get(analysis_cache_key(username))
+    return isinstance(entry, AnalysisEntry) and time.time() - entry.created <= Config.ANALYSIS_SOFT_TTL
+
+def is_cached(cache_key):
+    return lambda username: cache.has(cache_key(username))
+
+def classify_request(is_fresh):
+    # Split the requested handles into cache hits and misses once per request;
+    # every limit on a route reuses the split
+    if 'cache_split' not in g:
+        hits = misses = 0
+        for username in dict.fromkeys(normalize_username(u) for u in request_usernames() if isinstance(u, str)):
+            if not username:
+                continue
+            if is_fresh(username):
+                hits += 1
+            else:
+                misses += 1
+        g.cache_split = (hits, misses)
+    return g.cache_split
+
+def start_codeforces_work(handles=1):
+    # Called by views for each handle they fetch, queue or refresh
+    g.codeforces_work = g.get('codeforces_work', 0) + handles
+
+def succeeded(response):
+    return 200 <= response.status_code < 300
+
+@bp.after_app_request
+def charge_cost_ledger(response):
+    # Only requests the view accepted spend budget. The limiter deducts after
+    # this hook, so the split is left in g for it
+    split = g.get('cache_split')
+    if split is not None and succeeded(response):
+        cost_ledger.charge(*split)
+    return response
+
+def client_cost(is_fresh):
+    return lambda: cost_ledger.cost(*classify_request(is_fresh))
+
+def codeforces_cost(is_fresh):
+    # Checked against the expected misses, deducted by the work the view started
+    return lambda: g.codeforces_work if 'codeforces_work' in g else classify_request(is_fresh)[1]
+
+def codeforces_limit(is_fresh):
+    # One unit per handle fetched from Codeforces, from a budget shared by all
+    # clients, of which each client may take only a part
+    def decorator(view):
+        started = lambda response: g.get('codeforces_work', 0) > 0
+        view = limiter.limit(Config.RATELIMIT_CODEFORCES_CLIENT, scope='codeforces-client',
+                             cost=codeforces_cost(is_fresh), deduct_when=started)(view)
+        return limiter.shared_limit(Config.RATELIMIT_CODEFORCES, scope='codeforces', key_func=lambda: 'codeforces',
+                                    cost=codeforces_cost(is_fresh), deduct_when=started)(view)
+    return decorator
+
+def weighted_limits(is_fresh):
+    def decorator(view):
+        view = codeforces_limit(is_fresh)(view)
+        return limiter.limit(Config.RATELIMIT_ANALYSIS, cost=client_cost(is_fresh), deduct_when=succeeded)(view)
+    return decorator
+
+@lazy_singleton
+def get_metrics_store():
+    return MetricsStore(Config.METRICS_DB, ttl=Config.METRICS_TTL)
+
+metrics_published_at = 0
+# Client metrics that only ever increase; the others are gauges
+CLIENT_COUNTERS = {'requests', 'coalesced', 'retries', 'failures', 'acquired', 'wait_seconds_total'}
+
+def publish_metrics(force=False):
+    # Counters are per process; share this worker's through the metrics store
+    global metrics_published_at
+    now = time.time()
+    if not force and now - metrics_published_at < Config.METRICS_PUBLISH_INTERVAL:
+        return
+    metrics_published_at = now
+    gauges, counters = {}, {}
+    # Don't build the client or load the problemset just to report them
+    if lazy_class_attribute.is_built(CodeforcesService, 'client'):
+        for name, value in CodeforcesService.client.metrics().items():
+            metrics = counters if name in CLIENT_COUNTERS else gauges
+            metrics[f'codeforces_client_{name}'] = value
+    if get_problemset_index.instances:
+        gauges['problemset_problems'] = len(get_problemset_index())
+    counters.update((f'ratelimit_{name}', value) for name, value in cost_ledger.metrics().items())
+    get_metrics_store().publish(os.getpid(), tracer.snapshot(gauges, counters))
+
+@bp.after_app_request
+def publish_worker_metrics(response):
+    try:
+        publish_metrics()
+    except sqlite3.Error as e:
+        print(f"Error publishing metrics: {e}")
+    return response
+
+@bp.route('/metrics')
+@limiter.exempt
+def metrics():
+    publish_metrics(force=True)
+    response = make_response(render_prometheus(get_metrics_store().snapshots()))
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+def run_analysis_job(username):
+    try:
+        result = build_analysis(username)
+    except requests.exceptions.JSONDecodeError:
+        return None, "gemini ai api is too loaded and try again later"
+    if not result:
+        return None, 'Invalid Codeforces username'
+    store_analysis(username, result)
+    return result, None
+
+# Cold analyses run here instead of on the request worker
+@lazy_singleton
+def get_analysis_jobs():
+    return JobQueue(Config.JOBS_DB, run_analysis_job, workers=Config.JOB_WORKERS)
+
+def job_payload(job):
+    payload = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': url_for('.analysis_job', job_id=job['id']),
+        'events_url': url_for('.analysis_job_events', job_id=job['id'])
+    }
+    if job['status'] == DONE:
+        payload['result'] = job['result']
+    elif job['status'] == FAILED:
+        payload['error'] = job['error']
+    return payload
+
+@bp.route('/analyze', methods=['POST'])
+@weighted_limits(analysis_is_fresh)
 def analyze():
-    username = request.json.get('username')
+    username = normalize_username(request.json.get('username'))
     
     if not username:
         return jsonify({'error': 'Username is required'}), 400
     
     try:
-        cache_key = f"user_analysis_{username}_{int(time.time() // 3600)}"
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return jsonify(cached_result)
+        entry = get_cached_analysis(username)
+        response = entry and encoded_response(username, 'analyze', entry)
+        if response:
+            response.headers['X-Cache'] = 'HIT'
+            return response
         
-        cf_data = CodeforcesService.get_user_data(username)
-        if not cf_data:
-            return jsonify({'error': 'Invalid Codeforces username'}), 400
-        
-        user_rating = cf_data['user_info'].get('rating', 0)
-        topics = SubmissionAnalyzer.analyze_submissions(cf_data['submissions'])
-        monthly_activity = SubmissionAnalyzer.analyze_monthly_activity(cf_data['submissions'])
-        statistics = SubmissionAnalyzer.calculate_statistics(cf_data['submissions'])
-        # NEW: catch gemini overload from training path generation
-        try:
-            training_path = generate_training_path(topics, user_rating)
-        except requests.exceptions.JSONDecodeError:
-            return jsonify({"error": "gemini ai api is too loaded and try again later"}), 503
-        recommendations = SubmissionAnalyzer.generate_recommendations(topics)
-        
-        result = {
-            'user_info': cf_data['user_info'],
-            'topics': topics,
-            'monthly_activity': monthly_activity,
-            'statistics': statistics,
-            'training_path': training_path,
-            'recommendations': recommendations
-        }
-        cache.set(cache_key, result)
-        return jsonify(result)
+        # Cold analysis: hand it to the job queue and let the client poll or subscribe
+        job_id, created = get_analysis_jobs().submit(username)
+        if created:
+            start_codeforces_work()
+        response = jsonify(job_payload({'id': job_id, 'status': QUEUED}))
+        response.headers['X-Cache'] = 'MISS'
+        return response, 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    
+
+@bp.route('/analyze/jobs/<job_id>')
+@limiter.exempt
+def analysis_job(job_id):
+    job = get_analysis_jobs().get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_payload(job))
+
+@bp.route('/analyze/jobs/<job_id>/events')
+@limiter.exempt
+def analysis_job_events(job_id):
+    if not get_analysis_jobs().get(job_id):
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def generate():
+        # Server-Sent Events: one event per status change, closed once the job finishes
+        last_status = None
+        deadline = time.time() + Config.JOB_EVENTS_TIMEOUT
+        while time.time() < deadline:
+            job = get_analysis_jobs().get(job_id)
+            if job is None:
+                # Purged while streaming (see JobQueue retention)
+                yield f"event: gone\ndata: {json.dumps({'job_id': job_id, 'status': 'gone', 'error': 'Unknown job'})}\n\n"
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                yield f"event: {last_status}\ndata: {json.dumps(job_payload(job))}\n\n"
+                if last_status in (DONE, FAILED):
+                    return
+            else:
+                yield ": keepalive\n\n"
+            time.sleep(Config.JOB_POLL_INTERVAL)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/analyze/batch', methods=['POST'])
+@limiter.limit(Config.RATELIMIT_BATCH)
+@codeforces_limit(analysis_is_fresh)
+def analyze_batch_endpoint():
+    usernames = (request.json or {}).get('usernames')
+    if not usernames or not isinstance(usernames, list) or not all(isinstance(u, str) for u in usernames):
+        return jsonify({'error': 'A list of usernames is required'}), 400
+    if len(usernames) > Config.BATCH_MAX_HANDLES:
+        return jsonify({'error': f'At most {Config.BATCH_MAX_HANDLES} usernames per batch'}), 400
+
+    results = analyze_batch(usernames)
+
+    def generate():
+        # One JSON object per line, in completion order
+        for username, body, error in results:
+            if error:
+                yield json.dumps({'username': username, 'error': error}).encode() + b'\n'
+            else:
+                # The body is already encoded JSON; splice it in rather than re-encoding it
+                yield b'{"username": ' + json.dumps(username).encode() + b', "result": ' + body + b'}\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # Download analysis as JSON
-@app.route('/download', methods=['GET'])
-@limiter.limit("30 per hour")
-@cache.cached(timeout=3600) # Cache for 1 hour
+@bp.route('/download', methods=['GET'])
+@weighted_limits(analysis_is_fresh)
 def download_analysis():
-    username = request.args.get('username')
+    username = normalize_username(request.args.get('username'))
     if not username:
         return jsonify({'error': 'Username query parameter is required'}), 400
-    cf = CodeforcesService.get_user_data(username)
-    if not cf:
-        return jsonify({'error': 'Invalid Codeforces username'}), 400
-    rating = cf['user_info'].get('rating', 0)
-    topics = SubmissionAnalyzer.analyze_submissions(cf['submissions'])
-    stats = SubmissionAnalyzer.calculate_statistics(cf['submissions'])
-    path = generate_training_path(topics, rating)
-    recs = SubmissionAnalyzer.generate_recommendations(topics)
-    result = {
-        'user_info': cf['user_info'],
-        'topics': topics,
-        'statistics': stats,
-        'training_path': path,
-        'recommendations': recs
-    }
-    response = make_response(jsonify(result))
+
+    entry = get_cached_analysis(username)
+    response = entry and encoded_response(username, 'download', entry)
+    if not response:
+        # Join (or start) the same job /analyze uses; the client fetches download_url once it is done
+        job_id, created = get_analysis_jobs().submit(username)
+        if created:
+            start_codeforces_work()
+        payload = job_payload({'id': job_id, 'status': QUEUED})
+        payload['download_url'] = url_for('.download_analysis', username=username)
+        response = jsonify(payload)
+        response.headers['X-Cache'] = 'MISS'
+        return response, 202
+
     response.headers['Content-Disposition'] = 'attachment; filename=analysis.json'
-    response.mimetype = 'application/json'
+    response.headers['X-Cache'] = 'HIT'
     return response
 
-@app.after_request
+# Rating trajectory and per-contest solve times
+@bp.route('/rating', methods=['GET'])
+@weighted_limits(is_cached(rating_cache_key))
+def rating_analytics():
+    username = normalize_username(request.args.get('username'))
+    if not username:
+        return jsonify({'error': 'Username query parameter is required'}), 400
+
+    cache_key = rating_cache_key(username)
+    result = cache.get(cache_key)
+    if result is None:
+        start_codeforces_work()
+        try:
+            state = CodeforcesService.get_user_rating_state(username)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 503
+        if state is None:
+            return jsonify({'error': 'Invalid Codeforces username'}), 404
+        result = state.analyze(Config.RATING_WINDOW)
+        cache.set(cache_key, result, timeout=Config.RATING_TTL)
+    return jsonify(result)
+
+# Submission heatmap over any date range, bucketed by day, week or month
+@bp.route('/activity', methods=['GET'])
+@weighted_limits(is_cached(activity_cache_key))
+def activity():
+    username = normalize_username(request.args.get('username'))
+    if not username:
+        return jsonify({'error': 'Username query parameter is required'}), 400
+
+    granularity = request.args.get('granularity', 'day')
+    try:
+        end = date.fromisoformat(request.args['to']).toordinal() if request.args.get('to') else date.today().toordinal()
+        start = date.fromisoformat(request.args['from']).toordinal() if request.args.get('from') else end - 364
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD dates'}), 400
+    if granularity not in ActivityRollup.GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(ActivityRollup.GRANULARITIES)}"}), 400
+    if not 0 <= end - start < Config.ACTIVITY_MAX_DAYS:
+        return jsonify({'error': f'from must not be after to, and the range is limited to {Config.ACTIVITY_MAX_DAYS} days'}), 400
+
+    rollup = cache.get(activity_cache_key(username))
+    if rollup is None:
+        start_codeforces_work()
+        try:
+            rollup = CodeforcesService.get_user_activity(username)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 503
+        if rollup is None:
+            return jsonify({'error': 'Invalid Codeforces username'}), 404
+        cache.set(activity_cache_key(username), rollup, timeout=Config.ACTIVITY_TTL)
+    return jsonify(rollup.query(start, end, granularity))
+
+@bp.after_app_request
 def add_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
@@ -246,5 +654,24 @@ def add_security_headers(response):
     response.headers['Permissions-Policy'] = 'geolocation=(), microphone=()'
     return response
 
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config['SECRET_KEY'] = os.urandom(24)
+    cache.init_app(app)
+    limiter.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
+def __getattr__(name):
+    # `app` (gunicorn app:app, Vercel) is created on first access rather than at import
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | {'app'})
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Codeforces API fixtures for offline benchmarks.
+
+Recorded responses live in benchmarks/fixtures/<name>.json.gz and are captured
+with `python -m benchmarks.fixtures record <handle>` (needs network access).
+When a recording is missing, a deterministic synthetic response with the same
+shape, including the fields the app never reads, is generated instead."""
+
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+TAGS = ['implementation', 'math', 'greedy', 'dp', 'data structures', 'brute force', 'constructive algorithms',
+        'graphs', 'sortings', 'binary search', 'dfs and similar', 'trees', 'strings', 'number theory',
+        'combinatorics', '*special problems', 'geometry', 'bitmasks', 'two pointers', 'dsu']
+VERDICTS = ['OK'] * 5 + ['WRONG_ANSWER'] * 3 + ['TIME_LIMIT_EXCEEDED', 'RUNTIME_ERROR', 'COMPILATION_ERROR']
+LANGUAGES = ['GNU C++17', 'GNU C++20 (64)', 'Python 3', 'PyPy 3-64', 'Java 21']
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, f'{name}.json.gz')
+
+
+def load_recorded(name):
+    path = fixture_path(name)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_problems(count=10000, seed=1):
+    rng = random.Random(seed)
+    problems, statistics = [], []
+    for i in range(count):
+        contest_id, index = 2000 - i // 6, 'ABCDEF'[i % 6]
+        problem = {'contestId': contest_id, 'index': index, 'name': f'Problem {contest_id}{index}',
+                   'type': 'PROGRAMMING', 'tags': rng.sample(TAGS, rng.randint(0, 4))}
+        if rng.random() < 0.9:
+            problem['rating'] = rng.randrange(800, 3600, 100)
+            problem['points'] = float(rng.choice([500, 1000, 1500, 2000]))
+        problems.append(problem)
+        statistics.append({'contestId': contest_id, 'index': index, 'solvedCount': int(rng.paretovariate(1.2) * 200)})
+    return {'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}
+
+
+def synthetic_user_status(count, handle='tourist', seed=2, now=None):
+    rng = random.Random(seed)
+    now = int(now or time.time())
+    problemset = synthetic_problems()['result']['problems']
+    result = []
+    created = now
+    for i in range(count):
+        created -= rng.randint(60, 6 * 3600) if i % 50 else rng.randint(0, 14 * 86400)
+        problem = rng.choice(problemset)
+        result.append({
+            'id': 300000000 - i, 'contestId': problem['contestId'], 'creationTimeSeconds': created,
+            'relativeTimeSeconds': rng.randint(0, 7200), 'problem': problem,
+            'author': {'contestId': problem['contestId'], 'members': [{'handle': handle}],
+                       'participantType': rng.choice(['CONTESTANT', 'PRACTICE', 'VIRTUAL']),
+                       'ghost': False, 'startTimeSeconds': created - 3600},
+            'programmingLanguage': rng.choice(LANGUAGES), 'verdict': rng.choice(VERDICTS),
+            'testset': 'TESTS', 'passedTestCount': rng.randint(0, 80),
+            'timeConsumedMillis': rng.randint(15, 2000), 'memoryConsumedBytes': rng.randint(0, 256) * 1024 * 1024
+        })
+    return {'status': 'OK', 'result': result}
+
+
+def synthetic_user_info(handle='tourist', rating=3500):
+    return {'status': 'OK', 'result': [{
+        'handle': handle, 'rating': rating, 'maxRating': rating + 300, 'rank': 'legendary grandmaster',
+        'maxRank': 'tourist', 'contribution': 100, 'friendOfCount': 50000, 'registrationTimeSeconds': 1265987288,
+        'lastOnlineTimeSeconds': int(time.time()), 'avatar': 'https://userpic.codeforces.org/no-avatar.jpg',
+        'titlePhoto': 'https://userpic.codeforces.org/no-title.jpg'
+    }]}
+
+
+def user_status(count):
+    # Recorded history trimmed or synthetic history generated to `count` submissions
+    recorded = load_recorded('user.status')
+    if recorded and len(recorded['result']) >= count:
+        return {'status': 'OK', 'result': recorded['result'][:count]}
+    return synthetic_user_status(count)
+
+
+def problemset():
+    return load_recorded('problemset.problems') or synthetic_problems()
+
+
+def user_info():
+    return load_recorded('user.info') or synthetic_user_info()
+
+
+def encode(response):
+    return json.dumps(response, separators=(',', ':')).encode()
+
+
+def record(handle):
+    import requests
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    calls = {
+        'user.info': {'handles': handle},
+        'user.status': {'handle': handle},
+        'problemset.problems': {},
+    }
+    for method, params in calls.items():
+        response = requests.get(f'https://codeforces.com/api/{method}', params=params, timeout=60).json()
+        with gzip.open(fixture_path(method), 'wt', encoding='utf-8') as f:
+            json.dump(response, f)
+        print(f'recorded {method} -> {fixture_path(method)}')
+        time.sleep(2)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'record':
+        record(sys.argv[2])
+    else:
+        print('usage: python -m benchmarks.fixtures record <handle>')
@@ -0,0 +1,221 @@
+"""Load test of the app under gunicorn against the local Codeforces stand-in.
+
+Starts benchmarks.mock_server in-process and gunicorn with N workers
+pointed at it (fresh DATA_DIR, request rate limits off). Then drives a
+weighted mix of workloads from concurrent clients for a fixed duration:
+
+    analyze   POST /analyze, following a queued job to its result
+    download  GET /download, following a queued job and fetching the file
+    batch     POST /analyze/batch with --batch-size handles
+
+Handles are drawn from a pool with a skewed (Pareto) popularity, so repeat
+requests hit the cache. Prints one JSON report with p50/p95/p99 latency,
+throughput and the cache hit ratio (from the X-Cache header) per workload:
+
+    python -m benchmarks.load [--workers 4] [--concurrency 16] [--duration 30] [--mix analyze=6,download=3,batch=1]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import mock_server
+from benchmarks.stages import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(url, data=None, timeout=120):
+    """Return (status, headers, body); HTTP errors are results, not exceptions."""
+    body = None if data is None else json.dumps(data).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'} if body else {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, -(-p * len(sorted_values) // 100) - 1))]
+
+
+class LoadDriver:
+    def __init__(self, base_url, handles=50, batch_size=10, poll_interval=0.05, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.handles = [f'loaduser{i}' for i in range(handles)]
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)  # workload -> [(seconds, ok, cache status)]
+
+    def pick_handle(self):
+        with self._lock:
+            rank = int(self.rng.paretovariate(1.1)) - 1
+        return self.handles[rank % len(self.handles)]
+
+    def follow_job(self, job):
+        while job['status'] in ('queued', 'running'):
+            time.sleep(self.poll_interval)
+            status, _, body = request(self.base_url + job['status_url'])
+            if status != 200:
+                return False
+            job = json.loads(body)
+        return job['status'] == 'done'
+
+    def analyze(self):
+        status, headers, body = request(f'{self.base_url}/analyze', {'username': self.pick_handle()})
+        cache_status = headers.get('X-Cache')
+        if status != 202:
+            return status == 200, cache_status
+        return self.follow_job(json.loads(body)), cache_status
+
+    def download(self):
+        status, headers, body = request(f'{self.base_url}/download?username={self.pick_handle()}')
+        cache_status = headers.get('X-Cache')
+        if status != 202:
+            return status == 200, cache_status
+        job = json.loads(body)
+        if not self.follow_job(job):
+            return False, cache_status
+        return request(self.base_url + job['download_url'])[0] == 200, cache_status
+
+    def batch(self):
+        usernames = [self.pick_handle() for _ in range(self.batch_size)]
+        status, _, body = request(f'{self.base_url}/analyze/batch', {'usernames': usernames})
+        ok = status == 200 and all('result' in json.loads(line) for line in body.splitlines() if line)
+        return ok, None
+
+    def run(self, mix, concurrency, duration):
+        workloads, weights = zip(*mix.items())
+        deadline = time.perf_counter() + duration
+
+        def worker(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                workload = rng.choices(workloads, weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok, cache_status = getattr(self, workload)()
+                except (OSError, ValueError, KeyError):
+                    ok, cache_status = False, None
+                with self._lock:
+                    self.samples[workload].append((time.perf_counter() - start, ok, cache_status))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(worker, i) for i in range(concurrency)]:
+                future.result()
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        results = {}
+        for workload, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds for seconds, _, _ in samples)
+            cached = [status for _, _, status in samples if status]
+            results[workload] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, ok, _ in samples if not ok),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                'cache_hit_ratio': round(cached.count('HIT') / len(cached), 3) if cached else None,
+            }
+        return results
+
+
+def start_gunicorn(port, workers, threads, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            sys.exit('gunicorn exited during startup')
+        try:
+            if request(f'http://127.0.0.1:{port}/', timeout=2)[0] == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit('gunicorn did not start within 60 s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test against a local Codeforces stand-in')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--mix', default='analyze=6,download=3,batch=1', help='workload weights')
+    parser.add_argument('--handles', type=int, default=50, help='distinct handles in the pool')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--mock-port', type=int, default=8001)
+    parser.add_argument('--url', help='drive an already running app instead of starting gunicorn')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    mock_server.add_arguments(parser)
+    args = parser.parse_args(argv)
+    mix = {name: float(weight) for name, weight in (item.split('=') for item in args.mix.split(','))}
+
+    mock = mock_server.MockCodeforces(args.submissions, args.latency, error_rate=args.error_rate,
+                                      rate_limit_rate=args.rate_limit_rate)
+    server = mock.serve(port=args.mock_port)
+    process = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            base_url = args.url
+            if base_url is None:
+                env = dict(os.environ, DATA_DIR=workdir, RATELIMIT_ENABLED='0',
+                           CODEFORCES_API_URL=f'http://127.0.0.1:{args.mock_port}/api/',
+                           CODEFORCES_RATE='1000', CODEFORCES_BURST='1000',
+                           CODEFORCES_RATELIMIT_FILE=os.path.join(workdir, 'codeforces-ratelimit.state'))
+                process = start_gunicorn(args.port, args.workers, args.threads, env)
+                base_url = f'http://127.0.0.1:{args.port}'
+            driver = LoadDriver(base_url, args.handles, args.batch_size)
+            elapsed = driver.run(mix, args.concurrency, args.duration)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+            server.shutdown()
+
+    report = {
+        'benchmark': 'load',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'config': {key: getattr(args, key) for key in ('workers', 'threads', 'concurrency', 'duration', 'mix', 'handles',
+                                                       'batch_size', 'submissions', 'latency', 'error_rate',
+                                                       'rate_limit_rate')},
+        'elapsed_s': round(elapsed, 2),
+        'results': driver.report(elapsed),
+        'codeforces_calls': dict(mock.stats),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
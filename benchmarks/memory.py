@@ -0,0 +1,59 @@
+"""Peak and retained memory of ingesting Codeforces responses: the full
+`response.json()` tree versus the streaming parser into slotted records.
+
+    python -m benchmarks.memory [--sizes 1000,10000,100000]
+
+Prints one JSON document with a row per fixture."""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from benchmarks import fixtures
+from src.services.client import STREAM_CHUNK_SIZE
+from src.services.records import PROBLEMSET_SCHEMA, USER_STATUS_SCHEMA
+from src.services.streaming import load_stream
+
+
+def chunks(body):
+    return (body[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(body), STREAM_CHUNK_SIZE))
+
+
+def measure(parse):
+    gc.collect()
+    tracemalloc.start()
+    result = parse()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'peak_bytes': peak, 'retained_bytes': retained}
+
+
+def run(sizes):
+    cases = [(f'user.status[{n}]', fixtures.user_status(n), USER_STATUS_SCHEMA) for n in sizes]
+    cases.append(('problemset.problems', fixtures.problemset(), PROBLEMSET_SCHEMA))
+    rows = []
+    for name, response, schema in cases:
+        body = fixtures.encode(response)
+        del response
+        rows.append({
+            'fixture': name,
+            'body_bytes': len(body),
+            'json_loads': measure(lambda: json.loads(body)),
+            'streaming': measure(lambda: load_stream(chunks(body), schema)),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    args = parser.parse_args(argv)
+    json.dump({'benchmark': 'memory', 'results': run([int(n) for n in args.sizes.split(',')])}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Local stand-in for the Codeforces API, serving benchmark fixtures.
+
+Answers user.info, user.status (with from/count paging), user.rating and
+problemset.problems for any handle, with configurable latency and injected
+failures. Handles starting with `missing` are reported as unknown.
+Point the app at it with CODEFORCES_API_URL=http://127.0.0.1:<port>/api/:
+
+    python -m benchmarks.mock_server [--port 8001] [--latency 0.05] [--error-rate 0.01] [--rate-limit-rate 0.01]
+
+GET /stats returns the calls served per method and the failures injected."""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import fixtures
+
+UNKNOWN_PREFIX = 'missing'
+
+
+def user_rating(handle, contests=30):
+    rng = random.Random(zlib.crc32(handle.encode()))
+    rating, result = 0, []
+    start = int(time.time()) - contests * 14 * 86400
+    for i in range(contests):
+        new_rating = max(0, rating + rng.randint(-120, 180)) if rating else 1400
+        result.append({'contestId': 1900 + i, 'contestName': f'Codeforces Round {900 + i}', 'handle': handle,
+                       'rank': rng.randint(1, 20000), 'ratingUpdateTimeSeconds': start + i * 14 * 86400,
+                       'oldRating': rating, 'newRating': new_rating})
+        rating = new_rating
+    return {'status': 'OK', 'result': result}
+
+
+class MockCodeforces:
+    def __init__(self, submissions=1000, latency=0.0, jitter=0.5, error_rate=0.0, rate_limit_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self.submissions = fixtures.user_status(submissions)['result']
+        self.problemset = fixtures.encode(fixtures.problemset())
+        self.user_status = fixtures.encode({'status': 'OK', 'result': self.submissions})
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def fault(self):
+        # HTTP status to inject, if any
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return 503
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+    def delay(self):
+        if self.latency:
+            with self._lock:
+                factor = 1 + self.rng.uniform(-self.jitter, self.jitter)
+            time.sleep(self.latency * factor)
+
+    def respond(self, method, params):
+        """Return (HTTP status, body bytes) for one API call."""
+        self.count(method)
+        self.delay()
+        status = self.fault()
+        if status is not None:
+            self.count(f'injected_{status}')
+            return status, fixtures.encode({'status': 'FAILED', 'comment': 'Call limit exceeded' if status == 429 else 'Service unavailable'})
+
+        if method == 'problemset.problems':
+            return 200, self.problemset
+        if method == 'user.info':
+            handles = params.get('handles', '').split(';')
+            for handle in handles:
+                if handle.lower().startswith(UNKNOWN_PREFIX):
+                    return 400, fixtures.encode({'status': 'FAILED', 'comment': f'handles: User with handle {handle} not found'})
+            users = [fixtures.synthetic_user_info(handle, 1200 + zlib.crc32(handle.encode()) % 1800)['result'][0]
+                     for handle in handles]
+            return 200, fixtures.encode({'status': 'OK', 'result': users})
+
+        handle = params.get('handle', '')
+        if handle.lower().startswith(UNKNOWN_PREFIX):
+            return 400, fixtures.encode({'status': 'FAILED', 'comment': f'handle: User with handle {handle} not found'})
+        if method == 'user.status':
+            if 'from' not in params:
+                return 200, self.user_status
+            start, count = int(params['from']), int(params.get('count', len(self.submissions)))
+            return 200, fixtures.encode({'status': 'OK', 'result': self.submissions[start - 1:start - 1 + count]})
+        if method == 'user.rating':
+            return 200, fixtures.encode(user_rating(handle))
+        return 400, fixtures.encode({'status': 'FAILED', 'comment': f'{method}: unknown method'})
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == '/stats':
+                    with mock._lock:
+                        status, body = 200, json.dumps(dict(mock.stats)).encode()
+                elif url.path.startswith('/api/'):
+                    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    status, body = mock.respond(url.path[len('/api/'):], params)
+                else:
+                    status, body = 404, b'{}'
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host='127.0.0.1', port=8001):
+        """Start serving on a daemon thread; returns the server (call shutdown())."""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def add_arguments(parser):
+    parser.add_argument('--submissions', type=int, default=1000, help='submissions per handle')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean seconds per API call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with HTTP 503')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of calls answered with HTTP 429')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local Codeforces API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    mock = MockCodeforces(args.submissions, args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    server = mock.serve(args.host, args.port)
+    print(f'serving Codeforces fixtures on http://{args.host}:{args.port}/api/')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
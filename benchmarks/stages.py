@@ -0,0 +1,119 @@
+"""Per-stage timings of the /analyze pipeline over recorded fixtures.
+
+Codeforces responses are replayed through FakeTransport, so no network is
+used. Every stage is timed for each input size and the results are printed
+as one JSON document that can be diffed between commits:
+
+    python -m benchmarks.stages [--sizes 100,1000,10000,100000] [--repeat 5] [--output bench.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fixtures
+from src.services.analyzer import AnalysisState, SubmissionAnalyzer
+from src.services.client import CodeforcesClient, FakeTransport
+from src.services.problemset import ProblemsetIndex
+from src.services.submissions import SubmissionStore
+
+DEFAULT_SIZES = '100,1000,10000,100000'
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, {'min_s': min(timings), 'median_s': statistics.median(timings), 'repeat': repeat}
+
+
+def fake_client(size):
+    status = fixtures.user_status(size)
+    return CodeforcesClient(transport=FakeTransport({
+        'user.info': fixtures.user_info(),
+        'user.status': status,
+        'problemset.problems': fixtures.problemset(),
+    }))
+
+
+def fetch(client, workdir):
+    # Cold fetch: user.info, full user.status sync into an empty store, problemset index load
+    path = os.path.join(workdir, f'submissions-{time.perf_counter_ns()}.db')
+    store = SubmissionStore(client, path)
+    user_info = client.submit('user.info', handles='tourist')
+    store.sync('tourist')
+    index = ProblemsetIndex(client=client)
+    index.refresh()
+    return user_info.result()['result'][0], store.load('tourist'), index
+
+
+def run_size(size, repeat, workdir):
+    import app
+
+    results = {}
+    client = fake_client(size)
+    (user_info, submissions, index), results['fetch'] = timed(lambda: fetch(client, workdir), repeat)
+    app.get_problemset_index.instances[()] = index
+
+    state, results['analysis_state_fold'] = timed(lambda: AnalysisState().fold(submissions), repeat)
+    topics, results['analyze_submissions'] = timed(state.analyze_submissions, repeat)
+    activity, results['analyze_monthly_activity'] = timed(state.analyze_monthly_activity, repeat)
+    stats, results['calculate_statistics'] = timed(state.calculate_statistics, repeat)
+    rating = user_info.get('rating', 0)
+    path, results['generate_training_path'] = timed(lambda: app.generate_training_path(topics, rating), repeat)
+    result = {
+        'user_info': user_info,
+        'topics': topics,
+        'monthly_activity': activity,
+        'statistics': stats,
+        'training_path': path,
+        'recommendations': SubmissionAnalyzer.generate_recommendations(topics)
+    }
+    _, results['json_serialization'] = timed(lambda: json.dumps(result), repeat)
+    return [dict(stage=stage, size=size, **timing) for stage, timing in results.items()]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-stage /analyze pipeline benchmarks')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated submission counts')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    rows = []
+    # Keep stdout clean for the JSON report
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+        for size in (int(n) for n in args.sizes.split(',')):
+            rows.extend(run_size(size, args.repeat, workdir))
+    report = {
+        'benchmark': 'stages',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'results': rows,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Import-time budget and cold-start time of the app module.
+
+Every run is a fresh interpreter with an empty DATA_DIR, as on a serverless
+cold start. `python -X importtime` attributes the import cost to the app's
+direct imports, and a second interpreter times the import plus the first
+request through an app from create_app():
+
+    python -m benchmarks.startup [--budget-ms 1500] [--repeat 5] [--output startup.json]
+
+Exits with status 1 when the app import exceeds the budget, pulls in a
+module listed in --forbid (by default the lazily loaded Gemini SDK), or has
+side effects: services are built on first use, so a bare import must start
+no threads and create nothing in DATA_DIR."""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stages import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FORBID = 'google.generativeai'
+
+COLD_START = '''
+import json, os, threading, time
+threads = threading.active_count()
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+side_effects = {{'threads': threading.active_count() - threads, 'files': sorted(os.listdir(os.environ['DATA_DIR']))}}
+response = {module}.create_app().test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({{'import_s': imported - start, 'first_request_s': served - imported, 'status': response.status_code,
+                  'import_side_effects': side_effects}}))
+'''
+
+
+def run(args, workdir):
+    env = dict(os.environ, DATA_DIR=workdir)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return result, elapsed
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | <2 spaces per nesting level>package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, label = line[len('import time:'):].split('|', 2)
+        label = label[1:]
+        rows.append({
+            'module': label.strip(),
+            'depth': (len(label) - len(label.lstrip())) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def import_profile(module, workdir, top):
+    result, _ = run(['-X', 'importtime', '-c', f'import {module}'], workdir)
+    rows = parse_importtime(result.stderr)
+    root = next(i for i, row in enumerate(rows) if row['module'] == module and row['depth'] == 0)
+    # Children are printed before their parent, so the app's own imports are
+    # the depth-1 rows between the previous top-level entry and the app's row
+    begin = root
+    while begin > 0 and rows[begin - 1]['depth'] > 0:
+        begin -= 1
+    children = [row for row in rows[begin:root] if row['depth'] == 1]
+    children.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return {
+        'cumulative_ms': rows[root]['cumulative_ms'],
+        'modules': {row['module'] for row in rows},
+        'heaviest_imports': [{k: row[k] for k in ('module', 'cumulative_ms')} for row in children[:top]],
+    }
+
+
+def cold_start(module, workdir):
+    result, process_s = run(['-c', COLD_START.format(module=module)], workdir)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_s'] = process_s
+    return timings
+
+
+def median_of(samples, key):
+    return statistics.median(sample[key] for sample in samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time budget and cold-start time')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=1500)
+    parser.add_argument('--forbid', default=DEFAULT_FORBID, help='comma-separated modules that must stay unimported')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    profiles, cold_starts = [], []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            profiles.append(import_profile(args.module, workdir, args.top))
+        with tempfile.TemporaryDirectory() as workdir:
+            cold_starts.append(cold_start(args.module, workdir))
+
+    import_ms = median_of(profiles, 'cumulative_ms')
+    forbidden = sorted(set(filter(None, args.forbid.split(','))) & profiles[0]['modules'])
+    side_effects = cold_starts[0]['import_side_effects']
+    report = {
+        'benchmark': 'startup',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'results': {
+            'import_ms': import_ms,
+            'budget_ms': args.budget_ms,
+            'forbidden_imports': forbidden,
+            'import_side_effects': side_effects,
+            'heaviest_imports': profiles[len(profiles) // 2]['heaviest_imports'],
+            'cold_start': {
+                'import_s': median_of(cold_starts, 'import_s'),
+                'first_request_s': median_of(cold_starts, 'first_request_s'),
+                'process_s': median_of(cold_starts, 'process_s'),
+                'repeat': args.repeat,
+            },
+        },
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if import_ms > args.budget_ms or forbidden or side_effects['threads'] or side_effects['files']:
+        sys.exit(f'startup budget exceeded: import {import_ms:.0f} ms (budget {args.budget_ms:.0f} ms), '
+                 f'forbidden imports: {forbidden or "none"}, import side effects: {side_effects}')
+
+
+if __name__ == '__main__':
+    main()
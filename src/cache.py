@@ -0,0 +1,239 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from flask_caching.backends.base import BaseCache
+from limits.storage import Storage
+
+from src.services.tracing import traced
+
+COMPRESS_MIN_BYTES = 1024
+_RAW, _ZLIB = b'\x00', b'\x01'
+
+
+def dumps(value):
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(data, 1)
+    return _RAW + data
+
+
+def loads(blob):
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == _ZLIB else blob[1:]
+    return pickle.loads(data)
+
+
+class SQLiteDatabase:
+    """A WAL-mode SQLite file shared by every worker process on the host.
+    Each thread keeps its own connection."""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(schema)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteCache(BaseCache):
+    """flask_caching backend storing entries in a local SQLite-WAL file.
+
+    Values are pickled and zlib-compressed when large. When an insert takes
+    the table past `threshold` entries, expired entries are dropped first and
+    then the least recently used ones. Hits record their access time in
+    memory and write it back in batches, before any prune."""
+
+    TOUCH_BATCH = 64
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+    '''
+
+    def __init__(self, path, threshold=2000, default_timeout=300, **kwargs):
+        super().__init__(default_timeout=default_timeout, **kwargs)
+        self.threshold = threshold
+        self.db = SQLiteDatabase(path, self.SCHEMA)
+        self._touched = {}  # key -> last hit time, not yet written
+        self._touch_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(path=config['CACHE_SQLITE_PATH'], threshold=config['CACHE_THRESHOLD'])
+        return cls(*args, **kwargs)
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return float('inf') if timeout == 0 else time.time() + timeout
+
+    def _touch(self, key, now):
+        with self._touch_lock:
+            self._touched[key] = now
+            if len(self._touched) < self.TOUCH_BATCH:
+                return
+        self._flush_touches(self.db.connection())
+
+    def _flush_touches(self, conn):
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany('UPDATE cache SET accessed = MAX(accessed, ?) WHERE key = ?',
+                             [(now, key) for key, now in touched.items()])
+
+    def _prune(self, conn):
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self.threshold:
+            return
+        self._flush_touches(conn)
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        conn.execute('''DELETE FROM cache WHERE key IN (
+            SELECT key FROM cache ORDER BY accessed LIMIT MAX(0, (SELECT COUNT(*) FROM cache) - ?))''',
+                     (self.threshold,))
+
+    @traced('cache.get')
+    def get(self, key):
+        conn = self.db.connection()
+        now = time.time()
+        row = conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        self._touch(key, now)
+        return loads(row[0])
+
+    def set(self, key, value, timeout=None):
+        self.set_many({key: value}, timeout)
+        return True
+
+    @traced('cache.set')
+    def set_many(self, mapping, timeout=None):
+        # One transaction for all the keys
+        conn = self.db.connection()
+        now = time.time()
+        expires = self._expires(timeout)
+        rows = [(dumps(value), expires, now, key) for key, value in mapping.items()]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            inserted = False
+            for row in rows:
+                if not conn.execute('UPDATE cache SET value = ?, expires = ?, accessed = ? WHERE key = ?', row).rowcount:
+                    conn.execute('INSERT INTO cache (value, expires, accessed, key) VALUES (?, ?, ?, ?)', row)
+                    inserted = True
+            if inserted:
+                # Only a new row can take the table past the threshold
+                self._prune(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        conn = self.db.connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            added = conn.execute('INSERT OR IGNORE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                                 (key, dumps(value), self._expires(timeout), now)).rowcount == 1
+            if added:
+                self._prune(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def delete(self, key):
+        return self.db.connection().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount == 1
+
+    def has(self, key):
+        row = self.db.connection().execute('SELECT 1 FROM cache WHERE key = ? AND expires > ?',
+                                           (key, time.time())).fetchone()
+        return row is not None
+
+    def clear(self):
+        self.db.connection().execute('DELETE FROM cache')
+        return True
+
+
+class SQLiteStorage(Storage):
+    """flask_limiter/limits storage (fixed window) backed by SQLite, so all
+    workers share counters. URI form: sqlite:///<path>"""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS ratelimit (
+            key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            expires REAL NOT NULL
+        );
+    '''
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.db = SQLiteDatabase(uri[len('sqlite:///'):], self.SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        conn = self.db.connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT count, expires FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                count, expires = amount, now + expiry
+            else:
+                count, expires = row[0] + amount, now + expiry if elastic_expiry else row[1]
+            conn.execute('INSERT OR REPLACE INTO ratelimit (key, count, expires) VALUES (?, ?, ?)',
+                         (key, count, expires))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return count
+
+    def get(self, key):
+        row = self.db.connection().execute('SELECT count FROM ratelimit WHERE key = ? AND expires > ?',
+                                           (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self.db.connection().execute('SELECT expires FROM ratelimit WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self.db.connection().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self.db.connection().execute('DELETE FROM ratelimit').rowcount
+
+    def clear(self, key):
+        self.db.connection().execute('DELETE FROM ratelimit WHERE key = ?', (key,))
@@ -1,11 +1,78 @@
 from dotenv import load_dotenv
-import os
+import os, tempfile
 
 load_dotenv()
 
 class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    CACHE_TYPE = 'SimpleCache'
+    DATA_DIR = os.getenv('DATA_DIR', os.path.join(tempfile.gettempdir(), 'codeforces-planner'))
+    # Shared by all workers on the host; see src/cache.py
+    CACHE_TYPE = 'src.cache.SQLiteCache'
     CACHE_DEFAULT_TIMEOUT = 3600
+    CACHE_SQLITE_PATH = os.path.join(DATA_DIR, 'cache.db')
+    # Entries, not users: an analysis is an index entry plus one entry per body and encoding
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 10000))
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '1') == '1'
     RATELIMIT_DEFAULT = "30 per hour"
-    RATELIMIT_STORAGE_URL = "memory://"
\ No newline at end of file
+    RATELIMIT_STORAGE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'ratelimit.db')}"
+    # Analysis endpoints charge budget units per handle: cache hits are cheap,
+    # cold runs pay for their Codeforces calls. Only accepted requests are
+    # charged. RATELIMIT_CODEFORCES caps the handles fetched from Codeforces
+    # across all clients and RATELIMIT_CODEFORCES_CLIENT one client's share of
+    # it; batches count once per request against RATELIMIT_BATCH but once per
+    # uncached handle against both Codeforces limits.
+    RATELIMIT_ANALYSIS = "120 per hour"
+    RATELIMIT_HIT_COST = 1
+    RATELIMIT_MISS_COST = 4
+    RATELIMIT_BATCH = "30 per hour"
+    RATELIMIT_CODEFORCES = "1000 per hour"
+    RATELIMIT_CODEFORCES_CLIENT = "200 per hour"
+    PROBLEMSET_TTL = 3600
+    # Binary problemset snapshot for network-free cold starts; rewritten after
+    # each refresh. The bundled one is built at deploy time (src/services/snapshot.py)
+    PROBLEMSET_SNAPSHOT = os.path.join(DATA_DIR, 'problemset.snapshot')
+    PROBLEMSET_SNAPSHOT_BUNDLED = os.getenv('PROBLEMSET_SNAPSHOT_BUNDLED', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'problemset.snapshot'))
+    # Topic aliases, difficulty fallbacks and learning resources; edit to update resources
+    TOPICS_FILE = os.getenv('TOPICS_FILE', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'topics.json'))
+    # Point at a local stand-in (benchmarks/mock_server.py) for load tests
+    CODEFORCES_API_URL = os.getenv('CODEFORCES_API_URL', 'https://codeforces.com/api/')
+    CODEFORCES_TIMEOUT = 10
+    CODEFORCES_MAX_WORKERS = 8
+    # Codeforces allows roughly one call every two seconds per IP
+    CODEFORCES_RATE = float(os.getenv('CODEFORCES_RATE', 0.5))
+    CODEFORCES_BURST = int(os.getenv('CODEFORCES_BURST', 3))
+    CODEFORCES_RATELIMIT_FILE = os.getenv('CODEFORCES_RATELIMIT_FILE', os.path.join(tempfile.gettempdir(), 'codeforces-ratelimit.state'))
+    CODEFORCES_MAX_ATTEMPTS = 3
+    SUBMISSIONS_DB = os.path.join(DATA_DIR, 'submissions.db')
+    SUBMISSION_PAGE_SIZE = 100
+    USER_INFO_BATCH_SIZE = 300
+    BATCH_MAX_HANDLES = 500
+    BATCH_WORKERS = 4
+    JOBS_DB = os.path.join(DATA_DIR, 'jobs.db')
+    JOB_WORKERS = 2
+    JOB_POLL_INTERVAL = 0.5
+    JOB_EVENTS_TIMEOUT = 120
+    # /analyze results are served fresh until the soft TTL, then served stale
+    # while a single background refresh rebuilds them, until the hard TTL
+    ANALYSIS_SOFT_TTL = 600
+    ANALYSIS_HARD_TTL = 3600
+    ANALYSIS_REFRESH_TIMEOUT = 120
+    ANALYSIS_REFRESH_WORKERS = 2
+    # /rating: rolling window (in contests) and how long a computed response is cached
+    RATING_WINDOW = 5
+    RATING_TTL = 600
+    # /activity: how long a user's daily rollup is cached and the widest range served
+    ACTIVITY_TTL = 600
+    ACTIVITY_MAX_DAYS = 366 * 20
+    # Span histograms for /metrics; off by default
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', '0') == '1'
+    # Each worker publishes its metrics here at most every METRICS_PUBLISH_INTERVAL
+    # seconds, so a scrape of any worker reports all of them, labelled by pid
+    METRICS_DB = os.path.join(DATA_DIR, 'metrics.db')
+    METRICS_PUBLISH_INTERVAL = 5
+    METRICS_TTL = 300
+    # Requests sending this token in X-Profile-Token get their stack samples back instead of the body
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+    PROFILING_INTERVAL = 0.005
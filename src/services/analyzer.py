@@ -1,57 +1,185 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from src.services.topics import topic_registry
+from src.services.tracing import traced
+
+class ActivityRollup:
+    """Daily OK submission counts over a whole history, as one array indexed
+    by day (date ordinal - first_day) plus its prefix sums, so the total of
+    any day range, and so each day/week/month bucket, is O(1)."""
+
+    GRANULARITIES = ('day', 'week', 'month')
+
+    def __init__(self, days):
+        self.first_day = min(days, default=0)
+        self.counts = array('l', [0]) * (max(days, default=-1) - self.first_day + 1)
+        for day, count in days.items():
+            self.counts[day - self.first_day] = count
+        self.prefix = array('q', accumulate(self.counts, initial=0))
+
+    def total(self, start, end):
+        # OK submissions from day `start` through `end`, inclusive
+        lo = min(max(start - self.first_day, 0), len(self.counts))
+        hi = min(max(end + 1 - self.first_day, 0), len(self.counts))
+        return self.prefix[hi] - self.prefix[lo] if hi > lo else 0
 
-class SubmissionAnalyzer:
     @staticmethod
-    def analyze_submissions(submissions):
-        topics = {}
-        for sub in submissions:
-            try:
-                if 'problem' in sub and 'tags' in sub['problem']:
-                    for tag in sub['problem']['tags']:
-                        if tag not in topics:
-                            topics[tag] = {'solved': 0, 'attempted': 0}
-                        if 'verdict' in sub and sub['verdict'] == 'OK':
-                            topics[tag]['solved'] += 1
-                        else:
-                            topics[tag]['attempted'] += 1
-            except Exception as e:
-                print(f"Error processing submission tags: {e}")
-                continue
-        
-        return topics
+    def bucket_starts(start, end, granularity):
+        if granularity == 'day':
+            return list(range(start, end + 1))
+        if granularity == 'week':
+            # Weeks start on Monday; the first bucket is clipped to `start`
+            return [start] + list(range(start - date.fromordinal(start).weekday() + 7, end + 1, 7))
+        starts, month = [start], date.fromordinal(start).replace(day=1)
+        while True:
+            month = (month + timedelta(days=32)).replace(day=1)
+            if month.toordinal() > end:
+                return starts
+            starts.append(month.toordinal())
+
+    def query(self, start, end, granularity='day'):
+        starts = self.bucket_starts(start, end, granularity)
+        ends = [s - 1 for s in starts[1:]] + [end]
+        return {
+            'from': date.fromordinal(start).isoformat(),
+            'to': date.fromordinal(end).isoformat(),
+            'granularity': granularity,
+            'buckets': [{'start': date.fromordinal(s).isoformat(), 'count': self.total(s, e)}
+                        for s, e in zip(starts, ends)],
+            'total': self.total(start, end)
+        }
+
+class AnalysisState:
+    """Running per-user aggregates that can be folded forward with new submissions.
+
+    Holds per-tag solved/attempted counts, per-day OK counts and the set of
+    solved problem ids over the whole history, plus per-day problem records
+    for the trailing 90-day window.
+    Days are local date ordinals; the window is day-aligned and expired by
+    subtracting the buckets that age out."""
+
+    WINDOW_DAYS = 90
+
+    def __init__(self):
+        self.last_id = 0
+        self.topics = {}    # tag -> [solved, attempted]
+        self.days = {}      # day -> OK submissions
+        self.window = {}    # day -> {problem id -> [attempts, ok]}
+        self.problems = {}  # problem id -> [attempts, ok] summed over window
+        self.solved = set()  # problem ids with an OK verdict
+        self.window_start = 0
 
     @staticmethod
-    def analyze_monthly_activity(submissions):
-        today = datetime.today()
-        start_date = today - timedelta(days=90)
-        
-        daily_counts = defaultdict(int)
-        filtered_submissions = [
-            sub for sub in submissions 
-            if datetime.fromtimestamp(sub['creationTimeSeconds']) >= start_date
-        ]
-        
-        for sub in filtered_submissions:
-            sub_date = datetime.fromtimestamp(sub['creationTimeSeconds'])
-            if 'verdict' in sub and sub['verdict'] == 'OK':
-                daily_counts[sub_date.strftime('%Y-%m-%d')] += 1
-        
-        dates = [(start_date + timedelta(days=x)).strftime('%Y-%m-%d') 
-                for x in range(91)]
-        values = [daily_counts.get(date, 0) for date in dates]
-        
+    def today():
+        return datetime.today().toordinal()
+
+    @traced('analysis_state.fold')
+    def fold(self, submissions):
+        self.expire()
+        for sub in submissions:
+            ok = sub.get('verdict') == 'OK'
+            day = datetime.fromtimestamp(sub['creationTimeSeconds']).toordinal()
+            if ok:
+                self.days[day] = self.days.get(day, 0) + 1
+            problem = sub.get('problem')
+            if problem is not None:
+                for tag in problem.get('tags', ()):
+                    counts = self.topics.setdefault(tag, [0, 0])
+                    counts[0 if ok else 1] += 1
+                problem_id = f"{problem.get('contestId', 'unknown')}_{problem.get('index', 'unknown')}"
+                if ok:
+                    self.solved.add(problem_id)
+                if day >= self.window_start:
+                    for bucket in (self.window.setdefault(day, {}), self.problems):
+                        record = bucket.setdefault(problem_id, [0, 0])
+                        record[0] += 1
+                        record[1] += ok
+            self.last_id = max(self.last_id, sub.get('id', 0))
+        return self
+
+    def expire(self, today=None):
+        cutoff = (today or self.today()) - self.WINDOW_DAYS
+        for day in [d for d in self.window if d < cutoff]:
+            for problem_id, (attempts, ok) in self.window.pop(day).items():
+                record = self.problems[problem_id]
+                record[0] -= attempts
+                record[1] -= ok
+                if record[0] <= 0:
+                    del self.problems[problem_id]
+        self.window_start = max(self.window_start, cutoff)
+
+    @traced('analysis_state.analyze_submissions')
+    def analyze_submissions(self):
+        return {tag: {'solved': solved, 'attempted': attempted}
+                for tag, (solved, attempted) in self.topics.items()}
+
+    @traced('analysis_state.analyze_monthly_activity')
+    def analyze_monthly_activity(self):
+        start_date = datetime.today() - timedelta(days=90)
+        first_day = start_date.toordinal()
+        values = [self.days.get(first_day + x, 0) for x in range(91)]
         return {
-            'labels': dates,
+            'labels': [(start_date + timedelta(days=x)).strftime('%Y-%m-%d') for x in range(91)],
             'values': values,
             'total_solved': sum(values)
         }
 
+    @traced('analysis_state.calculate_statistics')
+    def calculate_statistics(self):
+        self.expire()
+        total_problems = len(self.problems)
+        solved_problems = sum(1 for _, ok in self.problems.values() if ok)
+        total_attempts = sum(attempts for attempts, _ in self.problems.values())
+        return {
+            'total_solved': solved_problems,
+            'avg_attempts': round(total_attempts / total_problems, 2) if total_problems else 0,
+            'success_rate': round((solved_problems / total_problems * 100), 1) if total_problems else 0,
+            'total_problems_attempted': total_problems,
+            'total_attempts': total_attempts
+        }
+
+    def copy(self):
+        return AnalysisState.from_dict(self.to_dict())
+
+    def to_dict(self):
+        return {
+            'last_id': self.last_id,
+            'topics': self.topics,
+            'days': self.days,
+            'window': self.window,
+            'solved': sorted(self.solved),
+            'window_start': self.window_start
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        if not data or 'solved' not in data:
+            # Missing or saved before solved ids were tracked: refold from scratch
+            return state
+        state.last_id = data['last_id']
+        state.topics = {tag: list(counts) for tag, counts in data['topics'].items()}
+        state.days = {int(day): n for day, n in data['days'].items()}
+        state.window = {int(day): {pid: list(r) for pid, r in records.items()}
+                        for day, records in data['window'].items()}
+        state.solved = set(data['solved'])
+        state.window_start = data['window_start']
+        for records in state.window.values():
+            for problem_id, (attempts, ok) in records.items():
+                record = state.problems.setdefault(problem_id, [0, 0])
+                record[0] += attempts
+                record[1] += ok
+        return state
+
+class SubmissionAnalyzer:
     @staticmethod
+    @traced('submission_analyzer.generate_recommendations')
     def generate_recommendations(topics):
         weak_topics = []
         for topic, stats in topics.items():
-            if topic.lower() == 'special problems':
+            if topic_registry.is_excluded(topic):
                 continue
             success_rate = stats['solved'] / (stats['solved'] + stats['attempted']) if stats['solved'] + stats['attempted'] > 0 else 0
             if success_rate < 0.5:
@@ -69,43 +197,3 @@ class SubmissionAnalyzer:
             recommendations.append("Great job! You're doing well across all topics.")
         
         return recommendations
-
-    @staticmethod
-    def calculate_statistics(submissions):
-        today = datetime.today()
-        start_date = today - timedelta(days=90)
-        
-        # Filter submissions for the last 90 days
-        monthly_submissions = [
-            s for s in submissions 
-            if datetime.fromtimestamp(s['creationTimeSeconds']) >= start_date
-        ]
-        
-        # Count unique problem attempts and solved status
-        problem_attempts = defaultdict(lambda: {'attempts': 0, 'solved': False})
-        for sub in monthly_submissions:
-            if 'problem' not in sub:
-                continue
-            problem = sub['problem']
-            problem_id = f"{problem.get('contestId', 'unknown')}_{problem.get('index', 'unknown')}"
-            problem_attempts[problem_id]['attempts'] += 1
-            if 'verdict' in sub and sub['verdict'] == 'OK':
-                problem_attempts[problem_id]['solved'] = True
-
-        total_problems = len(problem_attempts)
-        solved_problems = len([p for p in problem_attempts.values() if p['solved']])
-        total_attempts = sum(p['attempts'] for p in problem_attempts.values())
-        avg_attempts = round(total_attempts / total_problems, 2) if total_problems else 0
-        success_rate = round((solved_problems / total_problems * 100), 1) if total_problems else 0
-
-        response = {
-            'total_solved': solved_problems,
-            'avg_attempts': avg_attempts,
-            'success_rate': success_rate,
-            'total_problems_attempted': total_problems,
-            'total_attempts': total_attempts
-        }
-
-        print(response)
-
-        return response
\ No newline at end of file
@@ -0,0 +1,166 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.services.ratelimit import RetryBudget
+from src.services.streaming import load_stream
+from src.services.tracing import span
+
+API_URL = 'https://codeforces.com/api/'
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class CodeforcesError(Exception):
+    pass
+
+
+class HttpTransport:
+    """Keep-alive transport: one pooled requests.Session shared by all calls."""
+
+    def __init__(self, pool_size=8, api_url=API_URL):
+        self.api_url = api_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, method, params, timeout, schema=None):
+        response = self.session.get(self.api_url + method, params=params, timeout=timeout, stream=schema is not None)
+        try:
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise CodeforcesError(f'{method}: HTTP {response.status_code}')
+            if schema is not None:
+                return load_stream(response.iter_content(STREAM_CHUNK_SIZE), schema)
+            return response.json()
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+class FakeTransport:
+    """Offline transport that answers from canned payloads.
+
+    `responses` maps an API method name to either a response dict or a
+    callable taking the params dict. Every call is recorded in `calls`."""
+
+    def __init__(self, responses, latency=0):
+        self.responses = responses
+        self.latency = latency
+        self.calls = []
+
+    def get(self, method, params, timeout, schema=None):
+        self.calls.append((method, dict(params)))
+        if self.latency:
+            time.sleep(self.latency)
+        response = self.responses.get(method)
+        if response is None:
+            return {'status': 'FAILED', 'comment': f'{method}: no fake response'}
+        response = response(params) if callable(response) else response
+        if schema is not None:
+            # Go through the streaming parser exactly as a real body would
+            body = json.dumps(response).encode()
+            return load_stream((body[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(body), STREAM_CHUNK_SIZE)), schema)
+        return response
+
+    def close(self):
+        pass
+
+
+def is_rate_limited(response):
+    return response.get('status') == 'FAILED' and 'limit exceeded' in str(response.get('comment', '')).lower()
+
+
+class CodeforcesClient:
+    """Single entry point for Codeforces API calls.
+
+    Identical concurrent calls are coalesced into one request, every request
+    waits on the shared `rate_limiter` (if any), and transient failures are
+    retried with jittered backoff while the retry budget allows."""
+
+    def __init__(self, transport=None, timeout=10, max_workers=8, rate_limiter=None,
+                 max_attempts=3, backoff=0.5, retry_budget=None):
+        self.transport = transport or HttpTransport(pool_size=max_workers)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='codeforces')
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retry_budget = retry_budget or RetryBudget()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats = {'requests': 0, 'coalesced': 0, 'retries': 0, 'failures': 0}
+
+    def _count(self, name):
+        with self._inflight_lock:
+            self._stats[name] += 1
+
+    def call(self, method, timeout=None, schema=None, **params):
+        # `schema` (see records.py) streams the body into slotted records
+        key = (method, tuple(sorted(params.items())), id(schema))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._request(method, params, timeout or self.timeout, schema)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _request(self, method, params, timeout, schema):
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                with span('codeforces.rate_limit_wait'):
+                    self.rate_limiter.acquire()
+            self._count('requests')
+            try:
+                with span(f'codeforces.{method}'):
+                    response = self.transport.get(method, params, timeout, schema)
+                if is_rate_limited(response):
+                    raise CodeforcesError(f"{method}: {response.get('comment')}")
+                return response
+            except (requests.exceptions.RequestException, ValueError, CodeforcesError) as e:
+                attempt += 1
+                if attempt >= self.max_attempts or not self.retry_budget.withdraw():
+                    self._count('failures')
+                    raise CodeforcesError(f'{method} failed after {attempt} attempt(s): {e}') from e
+                self._count('retries')
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def submit(self, method, timeout=None, schema=None, **params):
+        return self.executor.submit(self.call, method, timeout, schema, **params)
+
+    def call_many(self, calls, timeout=None):
+        # calls: iterable of (method, params); results come back in the same order
+        futures = [self.submit(method, timeout, **params) for method, params in calls]
+        return [future.result() for future in futures]
+
+    def metrics(self):
+        with self._inflight_lock:
+            metrics = dict(self._stats, inflight=len(self._inflight))
+        metrics['retry_budget'] = round(self.retry_budget.tokens, 2)
+        if self.rate_limiter is not None:
+            metrics.update(self.rate_limiter.metrics())
+        return metrics
@@ -1,22 +1,154 @@
-import requests
+import functools
+import re
+import threading
+
 from flask_caching import Cache
 
+from src.config import Config
+from src.services.analyzer import ActivityRollup, AnalysisState
+from src.services.client import CodeforcesClient, HttpTransport
+from src.services.rating import RatingState
+from src.services.ratelimit import TokenBucket
+from src.services.records import USER_RATING_SCHEMA
+from src.services.submissions import SubmissionStore
+from src.services.topics import topic_registry
+
 cache = Cache()
 
-class CodeforcesService:
+UNKNOWN_HANDLE = re.compile(r'User with handle (\S+) not found')
+
+class lazy_class_attribute:
+    """Class attribute built by `factory(cls)` on first access and then
+    stored on the class, so importing the module creates nothing."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        with self._lock:
+            value = owner.__dict__[self.name]
+            if value is self:
+                value = self.factory(owner)
+                setattr(owner, self.name, value)
+        return value
+
     @staticmethod
-    def get_user_data(username):
-        user_info = requests.get(f'https://codeforces.com/api/user.info?handles={username}').json()
-        submissions = requests.get(f'https://codeforces.com/api/user.status?handle={username}').json()
-        
-        if user_info['status'] != 'OK' or submissions['status'] != 'OK':
+    def is_built(owner, name):
+        return not isinstance(owner.__dict__.get(name), lazy_class_attribute)
+
+
+def lazy_singleton(factory):
+    """Like functools.lru_cache(maxsize=None) on `factory`, but each value is
+    built under a lock, so concurrent first callers share one instance. The
+    values are kept in `instances`, keyed by the argument tuple."""
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get(*args):
+        try:
+            return get.instances[args]
+        except KeyError:
+            pass
+        with lock:
+            if args not in get.instances:
+                get.instances[args] = factory(*args)
+            return get.instances[args]
+
+    get.instances = {}
+    return get
+
+
+class CodeforcesService:
+    @lazy_class_attribute
+    def client(cls):
+        return CodeforcesClient(
+            transport=HttpTransport(pool_size=Config.CODEFORCES_MAX_WORKERS, api_url=Config.CODEFORCES_API_URL),
+            timeout=Config.CODEFORCES_TIMEOUT,
+            max_workers=Config.CODEFORCES_MAX_WORKERS,
+            rate_limiter=TokenBucket(Config.CODEFORCES_RATE, Config.CODEFORCES_BURST, Config.CODEFORCES_RATELIMIT_FILE),
+            max_attempts=Config.CODEFORCES_MAX_ATTEMPTS
+        )
+
+    @lazy_class_attribute
+    def submission_store(cls):
+        return SubmissionStore(cls.client, Config.SUBMISSIONS_DB, page_size=Config.SUBMISSION_PAGE_SIZE)
+
+    @classmethod
+    def get_users_info(cls, usernames):
+        """user.info for many handles in as few calls as possible. Returns a
+        dict keyed by lowercased handle; unknown handles are left out."""
+        remaining = list(dict.fromkeys(u.strip().lower() for u in usernames if u.strip()))
+        users = {}
+        for start in range(0, len(remaining), Config.USER_INFO_BATCH_SIZE):
+            chunk = remaining[start:start + Config.USER_INFO_BATCH_SIZE]
+            while chunk:
+                response = cls.client.call('user.info', handles=';'.join(chunk))
+                if response['status'] == 'OK':
+                    users.update((info['handle'].lower(), info) for info in response['result'])
+                    break
+                # One unknown handle fails the whole call: drop it and retry the rest
+                missing = UNKNOWN_HANDLE.search(response.get('comment', ''))
+                if not missing or missing.group(1).lower() not in chunk:
+                    break
+                chunk.remove(missing.group(1).lower())
+        return users
+
+    @classmethod
+    def get_user_analysis_state(cls, username, user_info=None):
+        # user.info and the incremental user.status sync are independent, so run them concurrently
+        info_future = cls.client.submit('user.info', handles=username) if user_info is None else None
+        synced = cls.submission_store.sync(username)
+        if info_future is not None:
+            response = info_future.result()
+            user_info = response['result'][0] if response['status'] == 'OK' else None
+
+        if user_info is None or synced is None:
             return None
-            
+
         return {
-            'user_info': user_info['result'][0],
-            'submissions': submissions['result'][:3000]
+            'user_info': user_info,
+            'state': cls.fold_state(username)
         }
 
+    @classmethod
+    def fold_state(cls, username):
+        # Fold only the submissions not yet in the persisted aggregates; those
+        # after the first one still being judged go into a throwaway copy
+        state = AnalysisState.from_dict(cls.submission_store.load_state(username))
+        final, pending = cls.submission_store.final_since(username, state.last_id)
+        if final:
+            state.fold(final)
+            cls.submission_store.save_state(username, state.to_dict())
+        if pending:
+            state = state.copy().fold(pending)
+        return state
+
+    @classmethod
+    def get_user_activity(cls, username):
+        # Full-history daily rollup; needs only the submission sync
+        if cls.submission_store.sync(username) is None:
+            return None
+        return ActivityRollup(cls.fold_state(username).days)
+
+    @classmethod
+    def get_user_rating_state(cls, username):
+        # Rating history and the submission sync run concurrently; both are folded
+        # into the persisted RatingState, which only processes what is new
+        rating = cls.client.submit('user.rating', schema=USER_RATING_SCHEMA, handle=username)
+        synced = cls.submission_store.sync(username)
+        response = rating.result()
+        if response['status'] != 'OK' or synced is None:
+            return None
+
+        state = RatingState.from_dict(cls.submission_store.load_state(username, 'rating_state'))
+        state.extend_ratings(response['result'])
+        final, _ = cls.submission_store.final_since(username, state.last_submission_id)
+        state.fold_submissions(final)
+        cls.submission_store.save_state(username, state.to_dict(), 'rating_state')
+        return state
+
     @staticmethod
     def get_difficulty_level(rating):
         if rating < 1200:
@@ -28,50 +160,4 @@ class CodeforcesService:
         
     @staticmethod
     def get_cp_resources(topic):
-        resources = {
-            'implementation': [
-                ('USACO Guide - Bronze', 'https://usaco.guide/bronze/simulation'),
-                ('CSES Problem Set', 'https://cses.fi/problemset/list/'),
-                ('USACO Training Gateway', 'https://train.usaco.org/')
-            ],
-            'math': [
-                ('USACO Guide - Math Fundamentals', 'https://usaco.guide/bronze/math-cp'),
-                ('Project Euler', 'https://projecteuler.net/archives'),
-                ('IMO Training Materials', 'https://www.imo-official.org/problems.aspx')
-            ],
-            'dp': [
-                ('USACO Guide - Gold DP', 'https://usaco.guide/gold/dp-paths'),
-                ('AtCoder Educational DP', 'https://atcoder.jp/contests/dp'),
-                ('Errichto DP Guide', 'https://github.com/Errichto/youtube/wiki/DP-tutorial')
-            ],
-            'graphs': [
-                ('USACO Guide - Silver Graphs', 'https://usaco.guide/silver/graphs'),
-                ('CP Algorithms - Graphs', 'https://cp-algorithms.com/graph/breadth-first-search.html'),
-                ('Competitive Programming Handbook', 'https://cses.fi/book/book.pdf#page=119')
-            ],
-            'data structures': [
-                ('USACO Guide - Data Structures', 'https://usaco.guide/silver/binary-search'),
-                ('Competitive Programming Handbook', 'https://cses.fi/book/book.pdf#page=87'),
-                ('Algorithms for Competitive Programming', 'https://cp-algorithms.com/data_structures/segment_tree.html')
-            ],
-            'strings': [
-                ('USACO Guide - String Processing', 'https://usaco.guide/gold/string-fundamentals'),
-                ('CP Algorithms - Strings', 'https://cp-algorithms.com/string/string-hashing.html'),
-                ('HackerRank String Problems', 'https://www.hackerrank.com/domains/algorithms?filters%5Bsubdomains%5D%5B%5D=strings')
-            ],
-            'greedy': [
-                ('USACO Guide - Greedy Algorithms', 'https://usaco.guide/silver/greedy'),
-                ('Competitive Programming Handbook', 'https://cses.fi/book/book.pdf#page=63'),
-                ('Codeforces EDU - Greedy', 'https://codeforces.com/edu/course/2/lesson/2')
-            ]
-        }
-        default_resources = [
-            ('USACO Training Gateway', 'https://train.usaco.org/'),
-            ('Competitive Programming Handbook', 'https://cses.fi/book/book.pdf'),
-            ('CP Algorithms', 'https://cp-algorithms.com/'),
-            ('CSES Problem Set', 'https://cses.fi/problemset/'),
-            ('Codeforces EDU', 'https://codeforces.com/edu/courses')
-        ]
-        return resources.get(topic.lower(), default_resources)
-
-    
+        return topic_registry.resources(topic)
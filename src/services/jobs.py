@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobQueue:
+    """SQLite-backed queue of per-handle analysis jobs.
+
+    At most one queued or running job exists per handle, so repeated
+    submissions share a job id; submit() returns (job_id, created). Worker threads are started on the first
+    submit and claim jobs with an IMMEDIATE transaction, so several worker
+    processes can share one database. `handler(handle)` returns
+    (result, error); the result must be JSON-serializable."""
+
+    def __init__(self, path, handler, workers=2, poll_interval=0.5, stale_after=300, retention=3600):
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self._wakeup = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                handle TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_handle ON jobs (handle, status)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def submit(self, handle):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT id FROM jobs WHERE handle = ? AND status IN (?, ?)',
+                               (handle, QUEUED, RUNNING)).fetchone()
+            created = row is None
+            if row:
+                job_id = row[0]
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute('INSERT INTO jobs (id, handle, status, created, updated) VALUES (?, ?, ?, ?, ?)',
+                             (job_id, handle, QUEUED, now, now))
+            conn.execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?', (DONE, FAILED, now - self.retention))
+        self.start()
+        self._wakeup.set()
+        return job_id, created
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT id, handle, status, result, error, created, updated FROM jobs WHERE id = ?',
+                               (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'handle', 'status', 'result', 'error', 'created', 'updated'), row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+
+    def _claim(self):
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs left running by a dead worker go back to the queue
+            conn.execute('UPDATE jobs SET status = ?, updated = ? WHERE status = ? AND updated < ?',
+                         (QUEUED, now, RUNNING, now - self.stale_after))
+            row = conn.execute('SELECT id, handle FROM jobs WHERE status = ? ORDER BY created LIMIT 1',
+                               (QUEUED,)).fetchone()
+            if row:
+                conn.execute('UPDATE jobs SET status = ?, updated = ? WHERE id = ?', (RUNNING, now, row[0]))
+        return row
+
+    def _finish(self, job_id, result, error):
+        with self._transaction() as conn:
+            conn.execute('UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?',
+                         (FAILED if error else DONE, None if result is None else json.dumps(result),
+                          error, time.time(), job_id))
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Error claiming analysis job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            job_id, handle = job
+            try:
+                result, error = self.handler(handle)
+            except Exception as e:
+                result, error = None, str(e)
+            self._finish(job_id, result, error)
@@ -0,0 +1,263 @@
+import bisect
+import threading
+import time
+
+from src.services.client import CodeforcesClient
+from src.services.records import PROBLEMSET_SCHEMA
+from src.services.snapshot import read_snapshot, snapshot_created, write_snapshot
+from src.services.topics import topic_registry
+
+
+class ProblemsetStatistics:
+    """Per-tag rating percentiles, solve-count distributions and difficulty,
+    plus popularity ranks, computed once per problemset refresh.
+
+    A tag's difficulty (1-5) is its median rating's quintile among all tags;
+    popularity ranks are 1 for the most solved problem or tag."""
+
+    PERCENTILES = (10, 25, 50, 75, 90)
+    DIFFICULTY_LEVELS = 5
+
+    def __init__(self, tags=None, ranks=None):
+        self.tags = tags or {}    # tag -> summary
+        self.ranks = ranks or {}  # (contestId, index) -> popularity rank
+
+    @classmethod
+    def percentiles(cls, values):
+        # Nearest-rank percentiles of an already sorted list
+        return {p: values[min(len(values) - 1, p * len(values) // 100)] for p in cls.PERCENTILES}
+
+    @staticmethod
+    def popularity(counts):
+        # Competition ranking: equal counts share a rank
+        ranks, previous, rank = {}, None, 0
+        for position, (key, count) in enumerate(sorted(counts.items(), key=lambda item: -item[1]), 1):
+            if count != previous:
+                rank, previous = position, count
+            ranks[key] = rank
+        return ranks
+
+    @classmethod
+    def build(cls, by_tag, solved_counts):
+        """`by_tag` maps each tag to its problems sorted by rating."""
+        tags = {}
+        for tag, problems in by_tag.items():
+            if not problems:
+                continue
+            solves = sorted(solved_counts.get(ProblemsetIndex.problem_id(p), 0) for p in problems)
+            tags[tag] = {
+                'problems': len(problems),
+                'rating_percentiles': cls.percentiles([p['rating'] for p in problems]),
+                'solved_percentiles': cls.percentiles(solves),
+                'total_solved': sum(solves),
+            }
+        by_median = sorted(tags, key=lambda tag: tags[tag]['rating_percentiles'][50])
+        for position, tag in enumerate(by_median):
+            tags[tag]['difficulty'] = 1 + position * cls.DIFFICULTY_LEVELS // len(by_median)
+        for tag, rank in cls.popularity({tag: summary['total_solved'] for tag, summary in tags.items()}).items():
+            tags[tag]['popularity_rank'] = rank
+        return cls(tags, cls.popularity(solved_counts))
+
+    def tag(self, tag):
+        return self.tags.get(topic_registry.canonical(tag))
+
+    def difficulty(self, tag, default=3):
+        summary = self.tags.get(topic_registry.canonical(tag))
+        return summary['difficulty'] if summary else default
+
+    def rank(self, problem):
+        return self.ranks.get(ProblemsetIndex.problem_id(problem))
+
+
+class ProblemsetIndex:
+    """In-memory index of problemset.problems: tag -> problems sorted by rating,
+    plus one array per rating bucket. Loaded once, refreshed in the background.
+
+    With a `snapshot_path`, a cold index is first loaded from the on-disk
+    snapshot (see snapshot.py) and every successful refresh rewrites it. A
+    read-only `bundled_snapshot_path` (built at deploy time) is loaded instead
+    when it is newer."""
+
+    def __init__(self, client=None, ttl=3600, snapshot_path=None, bundled_snapshot_path=None):
+        self.client = client or CodeforcesClient()
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.bundled_snapshot_path = bundled_snapshot_path
+        self.solved_counts = {}  # (contestId, index) -> solvedCount
+        self.statistics = ProblemsetStatistics()
+        self.loaded_at = 0
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._seq = 0
+        self._problems = {}   # (contestId, index) -> (sort key, problem)
+        self._by_tag = {}     # tag -> ([sort keys], [problems])
+        self._by_rating = {}  # rating -> [problems]
+        self._ordinals = {}   # (contestId, index) -> dense id, never reused
+
+    @staticmethod
+    def problem_id(problem):
+        return (problem.get('contestId'), problem.get('index'))
+
+    def fetch_problems(self):
+        response = self.client.call('problemset.problems', schema=PROBLEMSET_SCHEMA)
+        if response['status'] != 'OK':
+            return None
+        return response['result']['problems'], response['result'].get('problemStatistics', [])
+
+    def __len__(self):
+        return len(self._problems)
+
+    def is_stale(self):
+        return time.time() - self.loaded_at > self.ttl
+
+    def ensure_loaded(self):
+        if not self._problems:
+            # Concurrent cold callers wait for a single initial download
+            with self._load_lock:
+                if not self._problems and not self.load_snapshot():
+                    self.refresh()
+        if self.is_stale():
+            self.refresh_async()
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error refreshing problemset: {e}")
+        finally:
+            self._refreshing = False
+
+    def newest_snapshot(self):
+        # Only the headers are read to compare the candidates
+        candidates = [(snapshot_created(path), path) for path in (self.snapshot_path, self.bundled_snapshot_path) if path]
+        candidates = [(created, path) for created, path in candidates if created is not None]
+        return max(candidates)[1] if candidates else None
+
+    def load_snapshot(self, path=None):
+        # The snapshot's creation time becomes loaded_at, so an old snapshot is
+        # served immediately and refreshed in the background
+        path = path or self.newest_snapshot()
+        snapshot = read_snapshot(path) if path else None
+        if snapshot is None:
+            return False
+        created, problems, solved_counts = snapshot
+        self.update(problems, loaded_at=created, full=True)
+        with self._lock:
+            self.solved_counts = solved_counts
+        self.rebuild_statistics()
+        return True
+
+    def save_snapshot(self, path=None):
+        path = path or self.snapshot_path
+        with self._lock:
+            problems = [problem for _, problem in self._problems.values()]
+            solved_counts = dict(self.solved_counts)
+            loaded_at = self.loaded_at
+        write_snapshot(path, problems, solved_counts, created=loaded_at)
+
+    def refresh(self):
+        fetched = self.fetch_problems()
+        if fetched is None:
+            return False
+        problems, statistics = fetched
+        self.update(problems, full=True)
+        with self._lock:
+            self.solved_counts = {self.problem_id(stat): stat.get('solvedCount', 0) for stat in statistics}
+        self.rebuild_statistics()
+        if self.snapshot_path:
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                print(f"Error writing problemset snapshot: {e}")
+        return True
+
+    def rebuild_statistics(self):
+        with self._lock:
+            by_tag = {tag: list(items) for tag, (_, items) in self._by_tag.items()}
+            solved_counts = dict(self.solved_counts)
+        # Built outside the lock and swapped in whole, so readers never see a partial table
+        self.statistics = ProblemsetStatistics.build(by_tag, solved_counts)
+
+    def update(self, problems, loaded_at=None, full=False):
+        # Only touch problems that are new or whose rating/tags changed. A full
+        # update is the whole problemset: indexed problems missing from it are dropped
+        with self._lock:
+            seen = set()
+            for problem in problems:
+                if 'rating' not in problem:
+                    continue
+                pid = self.problem_id(problem)
+                seen.add(pid)
+                current = self._problems.get(pid)
+                if current is not None:
+                    old = current[1]
+                    if old.get('rating') == problem['rating'] and old.get('tags') == problem.get('tags'):
+                        continue
+                    self._remove(current)
+                self._insert(pid, problem)
+            if full:
+                for pid in self._problems.keys() - seen:
+                    self._remove(self._problems.pop(pid))
+            self.loaded_at = loaded_at or time.time()
+
+    def _insert(self, pid, problem):
+        self._ordinals.setdefault(pid, len(self._ordinals))
+        self._seq += 1
+        key = (problem['rating'], self._seq)
+        entry = (key, problem)
+        self._problems[pid] = entry
+        for tag in set(map(topic_registry.canonical, problem.get('tags', []))):
+            keys, items = self._by_tag.setdefault(tag, ([], []))
+            pos = bisect.bisect_left(keys, key)
+            keys.insert(pos, key)
+            items.insert(pos, problem)
+        self._by_rating.setdefault(problem['rating'], []).append(problem)
+
+    def _remove(self, entry):
+        key, problem = entry
+        for tag in set(map(topic_registry.canonical, problem.get('tags', []))):
+            keys, items = self._by_tag[tag]
+            pos = bisect.bisect_left(keys, key)
+            del keys[pos]
+            del items[pos]
+        self._by_rating[problem['rating']].remove(problem)
+
+    def by_tag(self, tag, min_rating, max_rating, count=None):
+        with self._lock:
+            keys, items = self._by_tag.get(topic_registry.canonical(tag), ((), ()))
+            lo = bisect.bisect_left(keys, (min_rating,))
+            hi = bisect.bisect_right(keys, (max_rating, float('inf')))
+            if count is not None:
+                hi = min(hi, lo + count)
+            return list(items[lo:hi])
+
+    def ordinal(self, problem):
+        return self._ordinals.get(self.problem_id(problem))
+
+    def solved_bitmap(self, solved):
+        """Bitmap over problem ordinals for 'contestId_index' ids (as kept
+        by AnalysisState.solved); ids not in the index are skipped."""
+        with self._lock:
+            bitmap = bytearray((len(self._ordinals) + 7) // 8)
+            for problem_id in solved:
+                contest_id, _, index = problem_id.partition('_')
+                ordinal = self._ordinals.get((int(contest_id) if contest_id.isdigit() else contest_id, index))
+                if ordinal is not None:
+                    bitmap[ordinal >> 3] |= 1 << (ordinal & 7)
+        return bitmap
+
+    def by_rating(self, rating):
+        with self._lock:
+            return list(self._by_rating.get(rating, ()))
+
+    def tags(self):
+        with self._lock:
+            return list(self._by_tag)
@@ -0,0 +1,135 @@
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a per-process bucket
+    fcntl = None
+
+_STATE = struct.Struct('dd')
+
+
+class TokenBucket:
+    """Token bucket for outbound Codeforces calls.
+
+    With `path` set (and fcntl available) the bucket state lives in that file
+    under an exclusive flock, so every worker process on the host draws from
+    the same budget. Otherwise the bucket is local to this process."""
+
+    def __init__(self, rate, burst=1, path=None):
+        self.rate = rate
+        self.burst = burst
+        self.path = path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self.waiting = 0
+        self.acquired = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._metrics_lock:
+            self.waiting += 1
+        try:
+            while True:
+                delay = self._try_take()
+                if delay <= 0:
+                    break
+                time.sleep(delay)
+        finally:
+            waited = time.monotonic() - start
+            with self._metrics_lock:
+                self.waiting -= 1
+                self.acquired += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return waited
+
+    def _take(self, tokens, updated, now):
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0
+        return tokens, (1 - tokens) / self.rate
+
+    def _try_take(self):
+        now = time.time()
+        with self._lock:
+            if self.path is None:
+                self._tokens, delay = self._take(self._tokens, self._updated, now)
+                self._updated = now
+                return delay
+            with open(self.path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    data = f.read(_STATE.size)
+                    tokens, updated = _STATE.unpack(data) if len(data) == _STATE.size else (float(self.burst), now)
+                    tokens, delay = self._take(tokens, updated, now)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(_STATE.pack(tokens, now))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return delay
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'queue_depth': self.waiting,
+                'acquired': self.acquired,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6)
+            }
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic: every call deposits
+    `ratio` tokens, every retry withdraws one."""
+
+    def __init__(self, ratio=0.2, initial=3, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(initial)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CostLedger:
+    """Prices requests for the cost-weighted request limits and counts the
+    budget spent on cache hits versus misses."""
+
+    def __init__(self, hit_cost=1, miss_cost=4):
+        self.hit_cost = hit_cost
+        self.miss_cost = miss_cost
+        self._lock = threading.Lock()
+        self._stats = {'hit_requests': 0, 'miss_requests': 0, 'hit_units': 0, 'miss_units': 0}
+
+    def cost(self, hits, misses):
+        return hits * self.hit_cost + misses * self.miss_cost
+
+    def charge(self, hits, misses):
+        with self._lock:
+            self._stats['hit_requests'] += hits
+            self._stats['miss_requests'] += misses
+            self._stats['hit_units'] += hits * self.hit_cost
+            self._stats['miss_units'] += misses * self.miss_cost
+        return self.cost(hits, misses)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,136 @@
+import math
+import operator
+from array import array
+from itertools import accumulate
+
+from src.services.tracing import traced
+
+# relativeTimeSeconds of submissions made outside a contest
+OUT_OF_CONTEST = 2147483647
+
+
+class RatingState:
+    """Per-handle rating history and in-contest solve times, extended in place
+    as new contests and submissions arrive.
+
+    Ratings and deltas are kept as arrays with running prefix sums (and sums
+    of squares), so every rolling mean or standard deviation is a difference
+    of two prefix entries rather than a loop over the window. `solve_times`
+    maps a contest id to the first accepted relativeTimeSeconds of each
+    problem solved during the contest."""
+
+    MOVING_WINDOW = 5
+
+    def __init__(self):
+        self.contest_ids = array('l')
+        self.contest_names = []
+        self.times = array('q')
+        self.ranks = array('l')
+        self.ratings = array('l')
+        self.deltas = array('l')
+        self._sums = {'ratings': array('d', [0]), 'deltas': array('d', [0]), 'deltas_sq': array('d', [0])}
+        self.solve_times = {}  # contest id -> {problem index: seconds}
+        self.last_submission_id = 0
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def extend_ratings(self, changes):
+        # user.rating always returns the whole history, oldest first; only the tail is new
+        fresh = changes[len(self):]
+        if not fresh:
+            return self
+        self.contest_ids.extend(c['contestId'] for c in fresh)
+        self.contest_names.extend(c.get('contestName', '') for c in fresh)
+        self.times.extend(c['ratingUpdateTimeSeconds'] for c in fresh)
+        self.ranks.extend(c.get('rank', 0) for c in fresh)
+        new_ratings = array('l', (c['newRating'] for c in fresh))
+        new_deltas = array('l', map(operator.sub, new_ratings, (c['oldRating'] for c in fresh)))
+        self.ratings.extend(new_ratings)
+        self.deltas.extend(new_deltas)
+        for name, values in (('ratings', new_ratings), ('deltas', new_deltas),
+                             ('deltas_sq', map(operator.mul, new_deltas, new_deltas))):
+            sums = self._sums[name]
+            sums.extend(accumulate(values, initial=sums.pop()))
+        return self
+
+    def fold_submissions(self, submissions):
+        for sub in submissions:
+            self.last_submission_id = max(self.last_submission_id, sub.get('id', 0))
+            relative = sub.get('relativeTimeSeconds', OUT_OF_CONTEST)
+            problem = sub.get('problem')
+            if sub.get('verdict') != 'OK' or relative is None or relative >= OUT_OF_CONTEST or problem is None:
+                continue
+            solved = self.solve_times.setdefault(sub['contestId'], {})
+            index = problem.get('index')
+            if index not in solved or relative < solved[index]:
+                solved[index] = relative
+        return self
+
+    def _window_sums(self, name, window):
+        # Sum of the last `window` values ending at each position
+        sums = self._sums[name]
+        return [sums[i + 1] - sums[max(0, i + 1 - window)] for i in range(len(self))]
+
+    def moving_average(self, window=MOVING_WINDOW):
+        totals = self._window_sums('ratings', window)
+        return [round(total / min(window, i + 1), 1) for i, total in enumerate(totals)]
+
+    def volatility(self, window=MOVING_WINDOW):
+        # Rolling population standard deviation of rating deltas
+        totals, squares = self._window_sums('deltas', window), self._window_sums('deltas_sq', window)
+        result = []
+        for i, (total, square) in enumerate(zip(totals, squares)):
+            n = min(window, i + 1)
+            result.append(round(math.sqrt(max(0.0, square / n - (total / n) ** 2)), 1))
+        return result
+
+    def solve_time_distribution(self):
+        # Minutes from contest start to each first accepted solution, per rated contest
+        distribution = {}
+        for contest_id in self.contest_ids:
+            minutes = sorted(seconds // 60 for seconds in self.solve_times.get(contest_id, {}).values())
+            distribution[str(contest_id)] = {
+                'solved': len(minutes),
+                'minutes': minutes,
+                'median_minutes': minutes[len(minutes) // 2] if minutes else None,
+            }
+        return distribution
+
+    @traced('rating_state.analyze')
+    def analyze(self, window=MOVING_WINDOW):
+        return {
+            'contests': [
+                {'contest_id': contest_id, 'contest_name': name, 'time': time, 'rank': rank,
+                 'rating': rating, 'delta': delta}
+                for contest_id, name, time, rank, rating, delta in zip(
+                    self.contest_ids, self.contest_names, self.times, self.ranks, self.ratings, self.deltas)
+            ],
+            'moving_average': self.moving_average(window),
+            'volatility': self.volatility(window),
+            'solve_times': self.solve_time_distribution(),
+            'max_rating': max(self.ratings, default=0),
+            'window': window,
+        }
+
+    def to_dict(self):
+        return {
+            'contests': [list(row) for row in zip(self.contest_ids, self.contest_names, self.times, self.ranks,
+                                                   (r - d for r, d in zip(self.ratings, self.deltas)), self.ratings)],
+            'solve_times': {str(contest_id): times for contest_id, times in self.solve_times.items()},
+            'last_submission_id': self.last_submission_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        if not data:
+            return state
+        state.extend_ratings([
+            {'contestId': contest_id, 'contestName': name, 'ratingUpdateTimeSeconds': time, 'rank': rank,
+             'oldRating': old, 'newRating': new}
+            for contest_id, name, time, rank, old, new in data['contests']
+        ])
+        state.solve_times = {int(contest_id): times for contest_id, times in data['solve_times'].items()}
+        state.last_submission_id = data['last_submission_id']
+        return state
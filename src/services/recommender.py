@@ -0,0 +1,41 @@
+import heapq
+
+from src.services.topics import topic_registry
+from src.services.tracing import traced
+
+
+class ProblemRecommender:
+    """Ranks one user's unsolved problems from the shared ProblemsetIndex.
+
+    Problems score higher the closer their rating is to slightly above the
+    user's, plus the weakness (1 - success rate) of every tag they carry, so
+    a problem that also exercises another weak topic wins ties. Solved
+    problems are skipped through a bitmap over the index's problem ordinals,
+    and the best `count` are kept with a bounded heap."""
+
+    RATING_STEP = 100   # aim this far above the user's rating
+    RATING_SCALE = 300  # rating distance that costs as much as one fully weak tag
+
+    def __init__(self, index, user_rating, solved=(), weakness=None):
+        self.index = index
+        self.target = max(user_rating or 0, 800) + self.RATING_STEP
+        self.solved = index.solved_bitmap(solved)
+        self.weakness = {topic_registry.canonical(tag): weight for tag, weight in (weakness or {}).items()}
+
+    @staticmethod
+    def weakness_from_topics(topics):
+        return {topic: 1 - stats['solved'] / (stats['solved'] + stats['attempted'])
+                for topic, stats in topics.items() if stats['solved'] + stats['attempted'] > 0}
+
+    def is_solved(self, problem):
+        ordinal = self.index.ordinal(problem)
+        return ordinal is not None and ordinal >> 3 < len(self.solved) and self.solved[ordinal >> 3] >> (ordinal & 7) & 1
+
+    def score(self, problem):
+        closeness = -abs(problem['rating'] - self.target) / self.RATING_SCALE
+        return closeness + sum(self.weakness.get(topic_registry.canonical(tag), 0) for tag in problem.get('tags', ()))
+
+    @traced('recommender.top')
+    def top(self, topic, min_rating, max_rating, count=3):
+        candidates = (p for p in self.index.by_tag(topic, min_rating, max_rating) if not self.is_solved(p))
+        return heapq.nlargest(count, candidates, key=self.score)
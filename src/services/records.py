@@ -0,0 +1,74 @@
+class Record:
+    """Slotted record holding only the fields the app reads.
+
+    Supports the read-only mapping access used on raw API dicts
+    (record['x'], record.get('x'), 'x' in record), with fields that were
+    absent in the response left unset."""
+
+    __slots__ = ()
+    NESTED = {}
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            if name in data:
+                value = data[name]
+                nested = cls.NESTED.get(name)
+                setattr(record, name, nested.from_dict(value) if nested and isinstance(value, dict) else value)
+        return record
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def to_dict(self):
+        data = {}
+        for name in self.__slots__:
+            if hasattr(self, name):
+                value = getattr(self, name)
+                data[name] = value.to_dict() if isinstance(value, Record) else value
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class Problem(Record):
+    __slots__ = ('contestId', 'index', 'name', 'rating', 'tags')
+
+
+class ProblemStatistics(Record):
+    __slots__ = ('contestId', 'index', 'solvedCount')
+
+
+class Submission(Record):
+    __slots__ = ('id', 'contestId', 'creationTimeSeconds', 'relativeTimeSeconds', 'problem', 'verdict')
+    NESTED = {'problem': Problem}
+
+
+class RatingChange(Record):
+    __slots__ = ('contestId', 'contestName', 'rank', 'ratingUpdateTimeSeconds', 'oldRating', 'newRating')
+
+
+# Streaming schemas: which arrays of a response to stream and how to build their items
+USER_STATUS_SCHEMA = {'result': Submission.from_dict}
+USER_RATING_SCHEMA = {'result': RatingChange.from_dict}
+PROBLEMSET_SCHEMA = {'result': {'problems': Problem.from_dict, 'problemStatistics': ProblemStatistics.from_dict}}
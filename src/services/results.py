@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def encode_json(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode()
+
+
+class EncodedPayload:
+    """A JSON body encoded once, with its compressed variants and ETag."""
+
+    __slots__ = ('identity', 'gzip', 'br', 'etag')
+
+    def __init__(self, obj):
+        self.identity = encode_json(obj)
+        self.gzip = gzip.compress(self.identity, compresslevel=6, mtime=0)
+        self.br = brotli.compress(self.identity, quality=5) if brotli is not None else None
+        self.etag = hashlib.sha1(self.identity).hexdigest()
+
+    def variants(self):
+        # content encoding -> body; None is the uncompressed body
+        variants = {None: self.identity, 'gzip': self.gzip}
+        if self.br is not None:
+            variants['br'] = self.br
+        return variants
+
+
+def negotiate(encodings, accept_encodings):
+    """Pick the content encoding to send from those stored, for a werkzeug
+    Accept-Encoding header; None means the uncompressed body."""
+    for encoding in ('br', 'gzip'):
+        if encoding in encodings and accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+class AnalysisEntry:
+    """What the cache keeps under an analysis key: when it was computed and,
+    per body ('analyze', 'download'), its ETag. The bodies themselves are
+    cached under their own keys, one per encoding, so a hit reads only the
+    bytes it sends."""
+
+    __slots__ = ('created', 'etags', 'encodings')
+
+    def __init__(self, created, etags, encodings):
+        self.created = created
+        self.etags = etags
+        self.encodings = encodings
+
+
+class AnalysisResult:
+    """One computed analysis, shared by /analyze and /download.
+
+    `data` is the full /analyze payload. Both the /analyze body and the
+    download body (a subset of the fields) are encoded once, when the result
+    is cached, so cache hits involve no serialization work."""
+
+    DOWNLOAD_FIELDS = ('user_info', 'topics', 'statistics', 'training_path', 'recommendations')
+
+    def __init__(self, data, created=None):
+        self.data = data
+        self.created = created or time.time()
+        self.analyze = None
+        self.download = None
+
+    def download_payload(self):
+        return {field: self.data[field] for field in self.DOWNLOAD_FIELDS}
+
+    def prepare(self):
+        if self.analyze is None:
+            self.analyze = EncodedPayload(self.data)
+            self.download = EncodedPayload(self.download_payload())
+        return self
+
+    def bodies(self):
+        # (body name, content encoding) -> bytes
+        self.prepare()
+        return {(name, encoding): body for name, payload in (('analyze', self.analyze), ('download', self.download))
+                for encoding, body in payload.variants().items()}
+
+    def entry(self):
+        self.prepare()
+        return AnalysisEntry(self.created, {'analyze': self.analyze.etag, 'download': self.download.etag},
+                             tuple(self.analyze.variants()))
@@ -0,0 +1,149 @@
+"""Compact on-disk snapshot of the problemset for network-free cold starts.
+
+Layout (little-endian, every section 4-byte aligned):
+
+    header      magic 'CFPS', version, created (f64), problems n, tag refs m, strings s
+    int32[n]    contestId, rating, solvedCount (-1 when unknown)
+    uint32[n]   index and name, as string table ids
+    uint32[n+1] offsets into the tag id array, then uint32[m] tag ids
+    uint32[s+1] string offsets, then the UTF-8 string blob
+
+Reading decodes every column into Problem records, so the file is read
+once and not kept open. Build one ahead of deployment with
+`python -m src.services.snapshot <path>`.
+"""
+
+import os
+import struct
+import sys
+import time
+from array import array
+
+from src.services.records import Problem
+
+MAGIC = b'CFPS'
+VERSION = 1
+HEADER = struct.Struct('<4sIdIII4x')
+
+
+def _column(typecode, values=()):
+    column = array(typecode, values)
+    assert column.itemsize == 4
+    return column
+
+
+def _little_endian(column):
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def write_snapshot(path, problems, solved_counts=None, created=None):
+    """Write `problems` (rated Problem records or dicts) atomically to `path`."""
+    solved_counts = solved_counts or {}
+    strings, string_ids = [], {}
+
+    def intern(value):
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    contest, rating, solved = _column('i'), _column('i'), _column('i')
+    index, name = _column('I'), _column('I')
+    tag_offsets, tag_ids = _column('I', [0]), _column('I')
+    for problem in problems:
+        contest_id, problem_index = problem.get('contestId', 0), problem.get('index', '')
+        contest.append(contest_id)
+        rating.append(problem['rating'])
+        solved.append(solved_counts.get((contest_id, problem_index), -1))
+        index.append(intern(problem_index))
+        name.append(intern(problem.get('name', '')))
+        tag_ids.extend(intern(tag) for tag in problem.get('tags', ()))
+        tag_offsets.append(len(tag_ids))
+
+    blob = bytearray()
+    string_offsets = _column('I', [0])
+    for value in strings:
+        blob += value.encode('utf-8')
+        string_offsets.append(len(blob))
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, created or time.time(), len(contest), len(tag_ids), len(strings)))
+        for column in (contest, rating, solved, index, name, tag_offsets, tag_ids, string_offsets):
+            f.write(_little_endian(column))
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def _header(data):
+    if len(data) < HEADER.size:
+        return None
+    header = HEADER.unpack_from(data, 0)
+    return header if header[:2] == (MAGIC, VERSION) else None
+
+
+def snapshot_created(path):
+    """Creation time of the snapshot at `path` from its header alone, or None."""
+    try:
+        with open(path, 'rb') as f:
+            header = _header(f.read(HEADER.size))
+    except OSError:
+        return None
+    return header[2] if header else None
+
+
+def read_snapshot(path):
+    """Read a snapshot and return (created, problems, solved_counts), or None
+    if the file is missing or not a snapshot of this version."""
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+    except OSError:
+        return None
+    header = _header(data)
+    if header is None:
+        return None
+    _, _, created, n, m, s = header
+    offset = HEADER.size
+
+    def take(typecode, count):
+        nonlocal offset
+        column = array(typecode)
+        column.frombytes(data[offset:offset + 4 * count])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        offset += 4 * count
+        return column
+
+    contest, rating, solved = take('i', n), take('i', n), take('i', n)
+    index, name = take('I', n), take('I', n)
+    tag_offsets, tag_ids = take('I', n + 1), take('I', m)
+    string_offsets = take('I', s + 1)
+    blob = bytes(data[offset:offset + string_offsets[-1]])
+    strings = [blob[string_offsets[i]:string_offsets[i + 1]].decode('utf-8') for i in range(s)]
+
+    problems, solved_counts = [], {}
+    for i in range(n):
+        problem = Problem(contestId=contest[i], index=strings[index[i]], name=strings[name[i]], rating=rating[i],
+                          tags=[strings[t] for t in tag_ids[tag_offsets[i]:tag_offsets[i + 1]]])
+        problems.append(problem)
+        if solved[i] >= 0:
+            solved_counts[(contest[i], problem.index)] = solved[i]
+    return created, problems, solved_counts
+
+
+if __name__ == '__main__':
+    from src.services.client import CodeforcesClient
+    from src.services.problemset import ProblemsetIndex
+
+    target = sys.argv[1] if len(sys.argv) > 1 else 'problemset.snapshot'
+    index = ProblemsetIndex(client=CodeforcesClient(), snapshot_path=target)
+    if not index.refresh():
+        sys.exit('problemset.problems failed')
+    print(f'wrote {len(index)} problems to {target}')
@@ -0,0 +1,97 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class StreamReader:
+    """Incremental JSON tokenizer over an iterable of byte chunks.
+
+    Only the unread tail of the body is kept in memory; each value is
+    decoded with raw_decode once enough of it has arrived."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self.decoder.decode(b'', final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON stream')
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f'Expected one of {chars!r} at stream offset, got {char!r}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number running into the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def read_object(self, schema):
+        obj = {}
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return obj
+        while True:
+            key = self.value()
+            self.expect(':')
+            handler = schema.get(key)
+            if isinstance(handler, dict) and self.peek() == '{':
+                obj[key] = self.read_object(handler)
+            elif callable(handler) and self.peek() == '[':
+                obj[key] = [handler(item) for item in self.iter_array()]
+            else:
+                obj[key] = self.value()
+            if self.expect(',}') == '}':
+                return obj
+
+
+def load_stream(chunks, schema):
+    """Parse a JSON object from byte chunks. Arrays named in `schema` are
+    decoded one element at a time and mapped through the given callable;
+    nested dicts in `schema` describe nested objects."""
+    return StreamReader(chunks).read_object(schema)
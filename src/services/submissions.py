@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from src.services.records import USER_STATUS_SCHEMA, Submission
+
+
+STATE_TABLES = ('analysis_state', 'rating_state')
+
+
+class SubmissionStore:
+    """Per-handle submission history persisted in SQLite.
+
+    sync() pages user.status newest-first and stops as soon as it reaches
+    submissions that are already stored with a final verdict, so a refresh
+    only transfers what changed since the last one."""
+
+    def __init__(self, client, path, page_size=100):
+        self.client = client
+        self.path = path
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS submissions (
+                handle TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                creation_time INTEGER NOT NULL,
+                verdict TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (handle, id)
+            )''')
+            for table in STATE_TABLES:
+                conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                    handle TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                )''')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize(handle):
+        return handle.strip().lower()
+
+    def watermark(self, handle):
+        # Highest id below which every stored submission has a final verdict
+        with self._connect() as conn:
+            pending = conn.execute(
+                "SELECT MIN(id) FROM submissions WHERE handle = ? AND (verdict IS NULL OR verdict = 'TESTING')",
+                (handle,)).fetchone()[0]
+            if pending is not None:
+                return pending - 1
+            return conn.execute('SELECT MAX(id) FROM submissions WHERE handle = ?', (handle,)).fetchone()[0]
+
+    def sync(self, username):
+        """Fetch submissions newer than the stored ones. Returns the list of
+        new or updated submissions (newest first), or None if the API call failed."""
+        handle = self.normalize(username)
+        watermark = self.watermark(handle)
+        fetched = []
+        if watermark is None:
+            response = self.client.call('user.status', schema=USER_STATUS_SCHEMA, handle=username)
+            if response['status'] != 'OK':
+                return None
+            fetched = response['result']
+        else:
+            start = 1
+            while True:
+                response = self.client.call('user.status', schema=USER_STATUS_SCHEMA, handle=username,
+                                            **{'from': start, 'count': self.page_size})
+                if response['status'] != 'OK':
+                    return None
+                page = response['result']
+                fresh = [s for s in page if s['id'] > watermark]
+                fetched.extend(fresh)
+                if len(fresh) < len(page) or len(page) < self.page_size:
+                    break
+                start += self.page_size
+        if fetched:
+            with self._lock, self._connect() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO submissions (handle, id, creation_time, verdict, data) VALUES (?, ?, ?, ?, ?)',
+                    [(handle, s['id'], s['creationTimeSeconds'], s.get('verdict'), json.dumps(s.to_dict(), separators=(',', ':')))
+                     for s in fetched])
+        return fetched
+
+    def load(self, username):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT data FROM submissions WHERE handle = ? ORDER BY id DESC',
+                                (self.normalize(username),)).fetchall()
+        return [Submission.from_dict(json.loads(data)) for data, in rows]
+
+    def since(self, username, after_id):
+        # Stored submissions newer than after_id, oldest first
+        with self._connect() as conn:
+            rows = conn.execute('SELECT data FROM submissions WHERE handle = ? AND id > ? ORDER BY id',
+                                (self.normalize(username), after_id)).fetchall()
+        return [Submission.from_dict(json.loads(data)) for data, in rows]
+
+    def final_since(self, username, after_id):
+        """Stored submissions newer than after_id, oldest first, split at the
+        first one still being judged: (final, pending). Aggregates fold only
+        the final ones, so a verdict is counted once it is settled."""
+        submissions = self.since(username, after_id)
+        final = 0
+        while final < len(submissions) and submissions[final].get('verdict') not in (None, 'TESTING'):
+            final += 1
+        return submissions[:final], submissions[final:]
+
+    def load_state(self, username, table='analysis_state'):
+        assert table in STATE_TABLES
+        with self._connect() as conn:
+            row = conn.execute(f'SELECT data FROM {table} WHERE handle = ?',
+                               (self.normalize(username),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_state(self, username, data, table='analysis_state'):
+        assert table in STATE_TABLES
+        with self._lock, self._connect() as conn:
+            conn.execute(f'INSERT OR REPLACE INTO {table} (handle, data) VALUES (?, ?)',
+                         (self.normalize(username), json.dumps(data, separators=(',', ':'))))
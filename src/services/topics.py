@@ -0,0 +1,71 @@
+import json
+import sys
+import threading
+
+from src.config import Config
+
+
+class TopicRegistry:
+    """Topic metadata loaded once from a JSON data file (see data/topics.json).
+
+    Every canonical name, alias and spelling seen so far maps to one interned
+    topic id, and difficulty, resources and the excluded flag are lists
+    indexed by that id, so each lookup is a couple of dict/list reads. Tags
+    missing from the file are interned under their lowercase name on first
+    use and get the default resources."""
+
+    def __init__(self, data):
+        self.names = []        # id -> canonical name
+        self.difficulties = []
+        self.resource_lists = []
+        self.excluded = []
+        self.default_resources = [tuple(resource) for resource in data.get('default_resources', ())]
+        self._ids = {}         # any spelling -> id
+        self._lock = threading.Lock()
+        for name, meta in data.get('topics', {}).items():
+            topic_id = self._intern(name, meta)
+            for alias in meta.get('aliases', ()):
+                self._ids[alias] = self._ids[alias.lower()] = topic_id
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _intern(self, name, meta):
+        name = sys.intern(name.strip().lower())
+        with self._lock:
+            topic_id = self._ids.get(name)
+            if topic_id is None:
+                topic_id = self._ids[name] = len(self.names)
+                self.names.append(name)
+                self.difficulties.append(meta.get('difficulty'))
+                self.resource_lists.append([tuple(resource) for resource in meta.get('resources', ())])
+                self.excluded.append(bool(meta.get('excluded')))
+        return topic_id
+
+    def topic_id(self, tag):
+        topic_id = self._ids.get(tag)
+        if topic_id is None:
+            # New spelling: normalize once and remember it
+            topic_id = self._ids.get(tag.strip().lower())
+            if topic_id is None:
+                topic_id = self._intern(tag, {})
+            self._ids[tag] = topic_id
+        return topic_id
+
+    def canonical(self, tag):
+        return self.names[self.topic_id(tag)]
+
+    def is_excluded(self, tag):
+        return self.excluded[self.topic_id(tag)]
+
+    def difficulty(self, tag, default=3):
+        difficulty = self.difficulties[self.topic_id(tag)]
+        return default if difficulty is None else difficulty
+
+    def resources(self, tag):
+        return self.resource_lists[self.topic_id(tag)] or self.default_resources
+
+
+topic_registry = TopicRegistry.load(Config.TOPICS_FILE)
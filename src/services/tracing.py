@@ -0,0 +1,202 @@
+import functools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from src.config import Config
+
+# Prometheus' default latency buckets, extended for slow Codeforces calls
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Tracer:
+    """Span timings aggregated into per-span histograms.
+
+    When disabled, span() returns a shared no-op context manager and traced()
+    returns the function undecorated, so instrumented code pays nothing."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def span(self, name):
+        return self._span(name) if self.enabled else _DISABLED
+
+    def traced(self, name):
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self._span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, gauges=None, counters=None):
+        # JSON-serializable, so another worker process can render it (see MetricsStore)
+        return {
+            'spans': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            'gauges': dict(gauges or {}),
+            'counters': dict(counters or {}),
+        }
+
+    def render_prometheus(self, gauges=None, counters=None):
+        return render_prometheus({None: self.snapshot(gauges, counters)})
+
+
+def render_prometheus(snapshots, buckets=BUCKETS):
+    """Prometheus text for {pid: Tracer.snapshot()}. Every series of a
+    process carries a pid label, unless its pid is None. Counters are
+    exported with a _total suffix."""
+    def labels(pid, **extra):
+        pairs = ([('pid', pid)] if pid is not None else []) + list(extra.items())
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+    processes = sorted(snapshots.items(), key=lambda item: str(item[0]))
+    lines = [
+        '# HELP codeforces_planner_span_seconds Duration of traced spans.',
+        '# TYPE codeforces_planner_span_seconds histogram'
+    ]
+    for pid, snapshot in processes:
+        for name, (counts, total) in sorted(snapshot['spans'].items()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'codeforces_planner_span_seconds_bucket{labels(pid, span=name, le=bound)} {cumulative}')
+            lines.append(f'codeforces_planner_span_seconds_sum{labels(pid, span=name)} {total}')
+            lines.append(f'codeforces_planner_span_seconds_count{labels(pid, span=name)} {cumulative}')
+    # One TYPE line per metric, then that metric's value in every process
+    for kind in ('gauges', 'counters'):
+        for name in sorted({name for _, snapshot in processes for name in snapshot.get(kind, {})}):
+            series = f'codeforces_planner_{name}'
+            if kind == 'counters' and not name.endswith('_total'):
+                series += '_total'
+            lines.append(f'# TYPE {series} {kind[:-1]}')
+            for pid, snapshot in processes:
+                if name in snapshot.get(kind, {}):
+                    lines.append(f'{series}{labels(pid)} {snapshot[kind][name]}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsStore:
+    """Latest metrics snapshot of each worker process on the host, in SQLite.
+
+    Workers publish their own snapshot every so often, so whichever worker
+    answers a scrape can render all of them. Processes that stop publishing
+    are dropped after `ttl` seconds."""
+
+    def __init__(self, path, ttl=300):
+        self.path = path
+        self.ttl = ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS metrics (
+                pid INTEGER PRIMARY KEY,
+                updated REAL NOT NULL,
+                data TEXT NOT NULL
+            )''')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def publish(self, pid, snapshot):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO metrics (pid, updated, data) VALUES (?, ?, ?)',
+                         (pid, time.time(), json.dumps(snapshot)))
+
+    def snapshots(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM metrics WHERE updated < ?', (time.time() - self.ttl,))
+            rows = conn.execute('SELECT pid, data FROM metrics').fetchall()
+        return {pid: json.loads(data) for pid, data in rows}
+
+
+class SamplingProfiler:
+    """Samples one thread's stack every `interval` seconds from a background
+    thread and aggregates them as collapsed stacks (flamegraph input)."""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_filename}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+tracer = Tracer(enabled=Config.TRACING_ENABLED)
+span = tracer.span
+traced = tracer.traced
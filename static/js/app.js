@@ -241,6 +241,17 @@
     };
 
     const dataHandlers = {
+        // Cold analyses are queued server-side; poll the job until it finishes
+        waitForJob: async (statusUrl) => {
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+                if (!response.ok) throw new Error(job.error);
+                if (job.status === 'done') return job.result;
+                if (job.status === 'failed') throw new Error(job.error);
+            }
+        },
         analyzeUser: async (username) => {
             ui.showLoading();
             try {
@@ -249,8 +260,9 @@
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ username })
                 });
-                const data = await response.json();
+                let data = await response.json();
                 if (!response.ok) throw new Error(data.error);
+                if (response.status === 202) data = await dataHandlers.waitForJob(data.status_url);
 
                 render.userInfo(data.user_info);
                 render.userStatus(data.user_info);
@@ -313,30 +325,32 @@
         }
     }
 
-    function downloadTrainingJSON() {
+    async function downloadTrainingJSON() {
         const username = elements.usernameInput.value.trim();
         if (!username) {
             ui.showError("Please enter a username before downloading.");
             return;
         }
-        fetch(`/download?username=${encodeURIComponent(username)}`)
-            .then(response => {
-                if (!response.ok) throw new Error("Failed to download JSON");
-                return response.blob();
-            })
-            .then(blob => {
-                const url = URL.createObjectURL(blob);
-                const link = document.createElement('a');
-                link.href = url;
-                link.download = `codeforces_training_plan_${username}.json`;
-                document.body.appendChild(link);
-                link.click();
-                document.body.removeChild(link);
-                URL.revokeObjectURL(url);
-            })
-            .catch(error => {
-                ui.showError(error.message);
-            });
+        try {
+            let response = await fetch(`/download?username=${encodeURIComponent(username)}`);
+            if (response.status === 202) {
+                // Not analyzed yet: wait for the queued job, then fetch the file
+                const job = await response.json();
+                await dataHandlers.waitForJob(job.status_url);
+                response = await fetch(job.download_url);
+            }
+            if (!response.ok) throw new Error("Failed to download JSON");
+            const url = URL.createObjectURL(await response.blob());
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `codeforces_training_plan_${username}.json`;
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            ui.showError(error.message);
+        }
     }
 
     window.downloadTrainingJSON = downloadTrainingJSON;
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# src.config reads these at import: keep the offline tests' caches and
+# databases out of the real DATA_DIR, and request limits off unless a test
+# builds its own app with them on
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='codeforces-planner-test-'))
+os.environ.setdefault('RATELIMIT_ENABLED', '0')
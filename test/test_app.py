@@ -22,15 +22,33 @@ def unique_ip_header():
         "X-Bypass-RateLimit": "true" 
     }
 
+GEMINI_OVERLOADED = "gemini ai api is too loaded and try again later"
+
+# Cold analyses answer 202 with a job; follow it until it finishes.
+# Returns (status_code, data) as the synchronous endpoint would have.
+def analyze_and_wait(username, timeout=180):
+    response = requests.post(f"{BASE_URL}/analyze", json={'username': username}, headers=unique_ip_header())
+    if response.status_code != 202:
+        return response.status_code, response.json()
+    status_url = response.json()['status_url']
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{BASE_URL}{status_url}").json()
+        if job['status'] == 'done':
+            return 200, job['result']
+        if job['status'] == 'failed':
+            return (503 if job['error'] == GEMINI_OVERLOADED else 400), {'error': job['error']}
+        time.sleep(1)
+    return 504, {}
+
 # Global helper for concurrent requests using a unique IP each call
 def global_make_request(_):
-    return requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
+    return analyze_and_wait('tourist')
 
 # External integration tests using unique IP headers
 def test_analyze_endpoint_success():
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
-    assert response.status_code == 200
-    data = response.json()
+    status_code, data = analyze_and_wait('tourist')
+    assert status_code == 200
     assert data.get('user_info', {}).get('handle', '').lower() == 'tourist'
 
 def test_analyze_endpoint_no_username():
@@ -41,19 +59,25 @@ def test_analyze_endpoint_no_username():
 
 # Functional Tests
 def test_analyze_endpoint():
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
-    assert response.status_code == 200
-    assert 'user_info' in response.json()
+    status_code, data = analyze_and_wait('tourist')
+    assert status_code == 200
+    assert 'user_info' in data
+
+def test_analyze_cold_request_returns_job():
+    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'petr'}, headers=unique_ip_header())
+    assert response.status_code in (200, 202)
+    if response.status_code == 202:
+        job = response.json()
+        assert job['status'] in ('queued', 'running', 'done')
+        assert requests.get(f"{BASE_URL}{job['status_url']}").status_code == 200
 
 def test_training_path_generation():
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
-    data = response.json()
+    _, data = analyze_and_wait('tourist')
     assert 'training_path' in data
     assert len(data['training_path']) > 0
 
 def test_recommendations_generation():
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
-    data = response.json()
+    _, data = analyze_and_wait('tourist')
     assert 'recommendations' in data
     assert len(data['recommendations']) > 0
 
@@ -106,11 +130,10 @@ def test_ui_elements_accessibility():
 def test_concurrent_requests():
     with multiprocessing.Pool(50) as pool:
         results = pool.map(global_make_request, range(50))
-        success_count = sum(1 for r in results if r.status_code == 200)
-        if any(r.status_code == 503 for r in results):
-            for r in results:
-                if r.status_code == 503:
-                    data = r.json()
+        success_count = sum(1 for status_code, _ in results if status_code == 200)
+        if any(status_code == 503 for status_code, _ in results):
+            for status_code, data in results:
+                if status_code == 503:
                     assert data.get('error') == "gemini ai api is too loaded and try again later"
         else:
             assert success_count >= 30
@@ -118,24 +141,21 @@ def test_concurrent_requests():
 # Check response time is within 3 minutes
 def test_response_time():
     start_time = time.time()
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
+    status_code, data = analyze_and_wait('tourist')
     end_time = time.time()
     duration = (end_time - start_time)
     assert duration < 180 # 3 minutes
-    if response.status_code == 503:
-        data = response.json()
+    if status_code == 503:
         assert data.get('error') == "gemini ai api is too loaded and try again later"
     else:
-        assert response.status_code == 200
+        assert status_code == 200
 
 # Update Regression Tests to accept gemini overload similarly.
 def test_api_backwards_compatibility():
-    response = requests.post(f"{BASE_URL}/analyze", json={'username': 'tourist'}, headers=unique_ip_header())
-    if response.status_code == 503:
-        data = response.json()
+    status_code, data = analyze_and_wait('tourist')
+    if status_code == 503:
         assert data.get('error') == "gemini ai api is too loaded and try again later"
     else:
-        data = response.json()
         required_fields = {
             'user_info', 'topics', 'monthly_activity',
             'statistics', 'training_path', 'recommendations'
@@ -0,0 +1,380 @@
+# Offline tests of the Flask routes through the test client #
+
+import gzip
+import json
+import os
+from datetime import date
+
+import pytest
+
+import app as planner
+from src.config import Config
+from src.services.analyzer import ActivityRollup
+from src.services.client import CodeforcesClient, CodeforcesError, FakeTransport
+from src.services.codeforces import CodeforcesService, lazy_class_attribute
+from src.services.problemset import ProblemsetIndex
+from src.services.ratelimit import CostLedger
+from limits import parse
+
+
+def make_analysis(handle, rating=1500):
+    return {'user_info': {'handle': handle, 'rating': rating}, 'topics': {'dp': {'solved': 1, 'attempted': 1}},
+            'monthly_activity': {'labels': [], 'values': [], 'total_solved': 0}, 'statistics': {},
+            'training_path': [], 'recommendations': ['Great job!']}
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+class RecordingJobs:
+    def __init__(self, states=()):
+        self.handles = []
+        self.states = list(states)  # what successive get() calls return
+
+    def submit(self, handle):
+        created = handle not in self.handles
+        self.handles.append(handle)
+        return f'job-{handle}', created
+
+    def get(self, job_id):
+        return self.states.pop(0) if self.states else None
+
+
+@pytest.fixture
+def client():
+    flask_app = planner.app
+    with flask_app.app_context():
+        planner.cache.clear()
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def codeforces(monkeypatch):
+    """Replace the Codeforces client with a FakeTransport; returns its responses dict."""
+    responses = {'problemset.problems': {'status': 'OK', 'result': {'problems': []}}}
+    client = CodeforcesClient(transport=FakeTransport(responses), max_attempts=1)
+    index = ProblemsetIndex(client=client)
+    monkeypatch.setattr(CodeforcesService, 'client', client)
+    monkeypatch.setitem(planner.get_problemset_index.instances, (), index)
+    return responses
+
+
+def user_info(params):
+    handles = params['handles'].split(';')
+    for handle in handles:
+        if handle.startswith('missing'):
+            return {'status': 'FAILED', 'comment': f'handles: User with handle {handle} not found'}
+    return {'status': 'OK', 'result': [{'handle': handle, 'rating': 1500} for handle in handles]}
+
+
+def batch_lines(client, usernames):
+    response = client.post('/analyze/batch', json={'usernames': usernames})
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    return {line['username']: line for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = RecordingExecutor()
+    monkeypatch.setattr(planner, 'get_executor', lambda name: executor)
+    return executor
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = RecordingJobs()
+    monkeypatch.setattr(planner, 'get_analysis_jobs', lambda: jobs)
+    return jobs
+
+
+def test_analyze_serves_fresh_hit(client, executor, jobs):
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    response = client.post('/analyze', json={'username': 'tourist'})
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'HIT'
+    assert response.get_json() == make_analysis('tourist')
+    assert executor.submitted == [] and jobs.handles == []
+
+
+def test_analyze_hit_reads_only_the_body_it_sends(client, jobs, monkeypatch):
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    keys = []
+    cache_get = planner.cache.get
+    monkeypatch.setattr(planner.cache, 'get', lambda key: keys.append(key) or cache_get(key))
+    response = client.post('/analyze', json={'username': 'tourist'}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == make_analysis('tourist')
+    assert keys == ['user_analysis_tourist', 'user_analysis_tourist_analyze_gzip']
+
+    keys.clear()
+    etag = response.headers['ETag'].strip('"')
+    response = client.post('/analyze', json={'username': 'tourist'}, headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304 and keys == ['user_analysis_tourist']
+
+    planner.cache.delete(planner.analysis_body_key('tourist', 'analyze'))
+    response = client.post('/analyze', json={'username': 'tourist'})
+    assert response.status_code == 202 and jobs.handles == ['tourist']
+
+
+def test_analyze_serves_soft_stale_hit_and_refreshes_once(client, executor, jobs, monkeypatch):
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    monkeypatch.setattr(Config, 'ANALYSIS_SOFT_TTL', -1)
+    for _ in range(3):
+        response = client.post('/analyze', json={'username': 'tourist'})
+        assert response.status_code == 200 and response.get_json() == make_analysis('tourist')
+    assert executor.submitted == [(planner.refresh_analysis, ('tourist',))]
+    assert jobs.handles == []
+
+    monkeypatch.setattr(planner, 'build_analysis', lambda username: make_analysis(username, rating=1600))
+    fn, args = executor.submitted[0]
+    fn(*args)
+    assert client.post('/analyze', json={'username': 'tourist'}).get_json()['user_info']['rating'] == 1600
+    # The refresh released its lock, so the next stale hit schedules another one
+    assert len(executor.submitted) == 2
+
+
+def test_analyze_queues_job_for_hard_expired_entry(client, executor, jobs, monkeypatch):
+    monkeypatch.setattr(Config, 'ANALYSIS_HARD_TTL', -1)
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    response = client.post('/analyze', json={'username': 'tourist'})
+    assert response.status_code == 202 and response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['job_id'] == 'job-tourist'
+    assert jobs.handles == ['tourist'] and executor.submitted == []
+
+
+def test_usernames_are_normalized_to_one_cache_key(client, executor, jobs):
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    response = client.post('/analyze', json={'username': '  TouRist '})
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'HIT'
+    assert client.get('/download?username=TOURIST').headers['X-Cache'] == 'HIT'
+    assert jobs.handles == []
+
+
+@pytest.fixture
+def limited_client(monkeypatch):
+    """A client of an app with the request limits on; the limiter is shared, so its switch is restored after."""
+    class LimitedConfig(Config):
+        RATELIMIT_ENABLED = True
+
+    monkeypatch.setattr(planner.limiter, 'enabled', planner.limiter.enabled)
+    flask_app = planner.create_app(LimitedConfig)
+    with flask_app.app_context():
+        planner.cache.clear()
+        planner.limiter.reset()
+    return flask_app.test_client()
+
+
+def codeforces_remaining(scope='codeforces', key='codeforces', limit=Config.RATELIMIT_CODEFORCES):
+    return planner.limiter.limiter.get_window_stats(parse(limit), key, scope).remaining
+
+
+def test_ledger_charges_admitted_requests_and_prices_stale_hits_as_misses(limited_client, executor, jobs, monkeypatch):
+    ledger = CostLedger(hit_cost=1, miss_cost=4)
+    monkeypatch.setattr(planner, 'cost_ledger', ledger)
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    planner.store_analysis('petr', make_analysis('petr'))
+    entry = planner.cache.get(planner.analysis_cache_key('petr'))
+    entry.created -= Config.ANALYSIS_SOFT_TTL + 1
+    planner.cache.set(planner.analysis_cache_key('petr'), entry)
+
+    assert limited_client.post('/analyze', json={'username': 'tourist'}).status_code == 200
+    assert limited_client.post('/analyze', json={'username': 'petr'}).status_code == 200
+    assert executor.submitted == [(planner.refresh_analysis, ('petr',))]
+    assert ledger.metrics() == {'hit_requests': 1, 'miss_requests': 1, 'hit_units': 1, 'miss_units': 4}
+    assert codeforces_remaining() == 999
+
+    # Priced past the limit: rejected before the view and not charged
+    ledger.miss_cost = 1000
+    assert limited_client.post('/analyze', json={'username': 'benq'}).status_code == 429
+    assert jobs.handles == [] and ledger.metrics()['miss_requests'] == 1
+    assert codeforces_remaining() == 999
+
+
+def test_codeforces_budget_charged_only_for_started_work(limited_client, jobs, monkeypatch):
+    ledger = CostLedger()
+    monkeypatch.setattr(planner, 'cost_ledger', ledger)
+    for _ in range(3):
+        assert limited_client.post('/analyze', json={'username': 'tourist'}).status_code == 202
+    assert limited_client.get('/download?username=tourist').status_code == 202
+    # One job was queued; the repeats joined it
+    assert jobs.handles == ['tourist'] * 4 and codeforces_remaining() == 999
+
+    assert limited_client.get('/activity?username=tourist&granularity=year').status_code == 400
+    assert ledger.metrics()['miss_requests'] == 4 and codeforces_remaining() == 999
+
+
+def test_rejected_batches_spend_no_budget(limited_client, jobs, monkeypatch):
+    ledger = CostLedger()
+    monkeypatch.setattr(planner, 'cost_ledger', ledger)
+    oversized = [f'user{i}' for i in range(Config.BATCH_MAX_HANDLES + 1)]
+    for _ in range(3):
+        assert limited_client.post('/analyze/batch', json={'usernames': oversized}).status_code == 400
+    assert limited_client.post('/analyze/batch', json={'usernames': 'tourist'}).status_code == 400
+    assert ledger.metrics()['miss_requests'] == 0 and codeforces_remaining() == 1000
+
+    other = limited_client.application.test_client()
+    other.environ_base['REMOTE_ADDR'] = '10.0.0.2'
+    response = other.post('/analyze', json={'username': 'tourist'})
+    assert response.status_code == 202 and codeforces_remaining() == 999
+
+
+def test_one_client_takes_only_its_share_of_codeforces_budget(limited_client, codeforces):
+    share = parse(Config.RATELIMIT_CODEFORCES_CLIENT).amount
+    batch = [f'user{i}' for i in range(share + 1)]
+    assert limited_client.post('/analyze/batch', json={'usernames': batch}).status_code == 429
+    assert codeforces_remaining() == 1000
+
+    codeforces['user.info'] = lambda params: {'status': 'FAILED', 'comment': 'handles: not found'}
+    response = limited_client.post('/analyze/batch', json={'usernames': batch[:share]})
+    assert response.status_code == 200 and len(response.get_data(as_text=True).splitlines()) == share
+    assert codeforces_remaining() == 1000 - share
+    assert limited_client.post('/analyze/batch', json={'usernames': ['petr']}).status_code == 429
+
+
+def test_metrics_report_every_worker_by_pid(client):
+    planner.get_metrics_store().publish(1, {'spans': {}, 'gauges': {}, 'counters': {'ratelimit_hit_requests': 7}})
+    text = client.get('/metrics').get_data(as_text=True)
+    assert text.count('# TYPE codeforces_planner_ratelimit_hit_requests_total counter') == 1
+    assert 'codeforces_planner_ratelimit_hit_requests_total{pid="1"} 7' in text
+    assert f'codeforces_planner_ratelimit_hit_requests_total{{pid="{os.getpid()}"}}' in text
+
+
+def test_requests_do_not_build_the_codeforces_client(client, monkeypatch):
+    def build(cls):
+        raise AssertionError('the Codeforces client was built')
+
+    build.__name__ = 'client'
+    monkeypatch.setattr(CodeforcesService, 'client', lazy_class_attribute(build))
+    monkeypatch.setattr(planner, 'metrics_published_at', 0)
+    assert client.get('/').status_code == 200
+    assert not lazy_class_attribute.is_built(CodeforcesService, 'client')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'codeforces_client_requests_total' not in text
+
+
+def test_batch_mixes_cached_unknown_and_failing_handles(client, codeforces, monkeypatch):
+    def build_analysis(username, user_info=None):
+        if username == 'petr':
+            raise CodeforcesError('user.status failed after 1 attempt(s)')
+        return make_analysis(username)
+
+    codeforces['user.info'] = user_info
+    monkeypatch.setattr(planner, 'build_analysis', build_analysis)
+    planner.store_analysis('tourist', make_analysis('tourist', rating=3800))
+    lines = batch_lines(client, ['Tourist', 'missingno', 'petr', 'benq', ' BenQ'])
+    assert lines == {
+        'tourist': {'username': 'tourist', 'result': make_analysis('tourist', rating=3800)},
+        'missingno': {'username': 'missingno', 'error': 'Invalid Codeforces username'},
+        'petr': {'username': 'petr', 'error': 'user.status failed after 1 attempt(s)'},
+        'benq': {'username': 'benq', 'result': make_analysis('benq')},
+    }
+    assert json.loads(planner.cache.get(planner.analysis_body_key('benq', 'analyze'))) == make_analysis('benq')
+
+
+def test_batch_reports_user_info_failure_per_handle(client, codeforces):
+    def failing(params):
+        raise CodeforcesError('user.info: HTTP 503')
+
+    codeforces['user.info'] = failing
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    lines = batch_lines(client, ['tourist', 'petr', 'benq'])
+    assert lines['tourist'] == {'username': 'tourist', 'result': make_analysis('tourist')}
+    assert set(lines) == {'tourist', 'petr', 'benq'}
+    for username in ('petr', 'benq'):
+        assert lines[username]['error'].startswith('user.info failed after 1 attempt(s)')
+
+
+def test_download_miss_returns_job_instead_of_blocking(client, jobs):
+    response = client.get('/download?username=Tourist')
+    assert response.status_code == 202 and response.headers['X-Cache'] == 'MISS'
+    payload = response.get_json()
+    assert payload['job_id'] == 'job-tourist' and payload['status'] == 'queued'
+    assert payload['download_url'] == '/download?username=tourist'
+    assert jobs.handles == ['tourist']
+
+    planner.store_analysis('tourist', make_analysis('tourist'))
+    response = client.get(payload['download_url'])
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'HIT'
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert 'monthly_activity' not in response.get_json()
+
+
+def test_job_events_end_with_gone_when_job_is_purged(client, monkeypatch):
+    job = {'id': 'job-tourist', 'status': 'running', 'result': None, 'error': None}
+    jobs = RecordingJobs([job, job, job])
+    monkeypatch.setattr(planner, 'get_analysis_jobs', lambda: jobs)
+    monkeypatch.setattr(Config, 'JOB_POLL_INTERVAL', 0)
+    events = client.get('/analyze/jobs/job-tourist/events').get_data(as_text=True).split('\n\n')
+    assert events[0].startswith('event: running\n')
+    assert events[1] == ': keepalive'
+    assert events[2].startswith('event: gone\n')
+    assert json.loads(events[2].split('data: ', 1)[1]) == {'job_id': 'job-tourist', 'status': 'gone', 'error': 'Unknown job'}
+    assert events[3:] == ['']
+
+
+@pytest.fixture
+def activity_calls(monkeypatch):
+    calls = []
+    day = date(2024, 1, 10).toordinal()
+
+    def get_user_activity(username):
+        calls.append(username)
+        return None if username.startswith('missing') else ActivityRollup({day: 2, day + 1: 1})
+
+    monkeypatch.setattr(CodeforcesService, 'get_user_activity', get_user_activity)
+    return calls
+
+
+def test_activity_validates_range_before_fetching(client, activity_calls):
+    assert client.get('/activity').status_code == 400
+    assert client.get('/activity?username=tourist&from=2024-13-01').status_code == 400
+    assert client.get('/activity?username=tourist&granularity=year').status_code == 400
+    assert client.get('/activity?username=tourist&from=2024-02-01&to=2024-01-01').status_code == 400
+    end = date(2024, 1, 11)
+    start = date.fromordinal(end.toordinal() - Config.ACTIVITY_MAX_DAYS)
+    response = client.get(f'/activity?username=tourist&from={start}&to={end}')
+    assert response.status_code == 400 and str(Config.ACTIVITY_MAX_DAYS) in response.get_json()['error']
+    assert activity_calls == []
+
+    start = date.fromordinal(start.toordinal() + 1)
+    assert client.get(f'/activity?username=tourist&from={start}&to={end}').get_json()['total'] == 3
+
+
+def test_activity_caches_rollup_under_normalized_handle(client, activity_calls):
+    response = client.get('/activity?username=%20TouRist&from=2024-01-10&to=2024-01-11&granularity=day')
+    assert [b['count'] for b in response.get_json()['buckets']] == [2, 1]
+    response = client.get('/activity?username=tourist&from=2024-01-01&to=2024-01-31&granularity=week')
+    assert response.status_code == 200 and response.get_json()['total'] == 3
+    assert activity_calls == ['tourist'] and planner.cache.has('activity_tourist')
+
+    response = client.get('/activity?username=missingno')
+    assert response.status_code == 404 and not planner.cache.has('activity_missingno')
+
+
+def test_rating_caches_analysis_under_normalized_handle(client, monkeypatch):
+    calls = []
+
+    class State:
+        def analyze(self, window):
+            return {'contests': [], 'window': window}
+
+    def get_user_rating_state(username):
+        calls.append(username)
+        if username == 'petr':
+            raise CodeforcesError('user.rating failed after 1 attempt(s)')
+        return None if username.startswith('missing') else State()
+
+    monkeypatch.setattr(CodeforcesService, 'get_user_rating_state', get_user_rating_state)
+    assert client.get('/rating').status_code == 400
+    for username in ('Tourist', ' tourist '):
+        response = client.get(f'/rating?username={username}')
+        assert response.get_json() == {'contests': [], 'window': Config.RATING_WINDOW}
+    assert calls == ['tourist'] and planner.cache.has('rating_tourist')
+
+    assert client.get('/rating?username=missingno').status_code == 404
+    assert client.get('/rating?username=petr').status_code == 503
+    assert not planner.cache.has('rating_missingno') and not planner.cache.has('rating_petr')
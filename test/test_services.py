@@ -0,0 +1,538 @@
+# Offline unit tests for src/services #
+
+import gzip
+import json
+import pickle
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from src.cache import SQLiteCache, SQLiteStorage
+from src.services.analyzer import ActivityRollup, AnalysisState
+from src.services.client import CodeforcesClient, CodeforcesError, FakeTransport
+from src.services.codeforces import CodeforcesService, lazy_singleton
+from src.services.jobs import JobQueue
+from src.services.problemset import ProblemsetIndex
+from src.services.rating import RatingState
+from src.services.ratelimit import CostLedger, RetryBudget, TokenBucket
+from src.services.recommender import ProblemRecommender
+from src.services.results import AnalysisResult, negotiate
+from src.services.snapshot import write_snapshot
+from src.services.records import PROBLEMSET_SCHEMA, USER_STATUS_SCHEMA, Problem, Submission
+from src.services.streaming import load_stream
+from src.services.topics import TopicRegistry, topic_registry
+from src.services.tracing import SamplingProfiler, Tracer
+from src.services.submissions import SubmissionStore
+
+
+def make_problem(contest_id, index, rating, tags):
+    return {'contestId': contest_id, 'index': index, 'name': f'{contest_id}{index}',
+            'rating': rating, 'tags': tags}
+
+
+@pytest.fixture
+def problems():
+    return [
+        make_problem(1, 'A', 800, ['math', 'Greedy']),
+        make_problem(2, 'A', 1500, ['dp']),
+        make_problem(3, 'B', 1300, ['dp', 'math']),
+        make_problem(4, 'C', 1900, ['dp']),
+        {'contestId': 5, 'index': 'A', 'name': 'Unrated', 'tags': ['dp']},
+    ]
+
+
+def test_problemset_index_by_tag_sorted_by_rating(problems):
+    index = ProblemsetIndex()
+    index.update(problems)
+    found = index.by_tag('dp', 1200, 1900)
+    assert [p['rating'] for p in found] == [1300, 1500, 1900]
+    assert index.by_tag('DP', 1200, 1900, count=1)[0]['contestId'] == 3
+    assert [p['contestId'] for p in index.by_tag('greedy', 800, 1200)] == [1]
+    assert index.by_tag('geometry', 800, 3500) == []
+    assert len(index) == 4
+
+
+def test_problemset_index_incremental_update(problems):
+    index = ProblemsetIndex()
+    index.update(problems)
+    index.update([make_problem(2, 'A', 1700, ['dp', 'graphs']), make_problem(6, 'D', 1250, ['dp'])])
+    assert [p['rating'] for p in index.by_tag('dp', 1200, 1900)] == [1250, 1300, 1700, 1900]
+    assert [p['contestId'] for p in index.by_tag('graphs', 800, 3500)] == [2]
+    assert index.by_rating(1500) == []
+    assert [p['contestId'] for p in index.by_rating(1700)] == [2]
+
+    index.update([make_problem(2, 'A', 1700, ['dp', 'graphs']), make_problem(3, 'B', 1300, ['dp', 'math'])], full=True)
+    assert len(index) == 2
+    assert [p['contestId'] for p in index.by_tag('dp', 800, 3500)] == [3, 2]
+    assert index.by_tag('greedy', 800, 3500) == [] and index.by_rating(1900) == []
+
+
+def test_client_call_many_runs_concurrently():
+    transport = FakeTransport({
+        'user.info': lambda params: {'status': 'OK', 'result': [{'handle': params['handles']}]},
+        'user.status': {'status': 'OK', 'result': []},
+    }, latency=0.2)
+    client = CodeforcesClient(transport=transport)
+    start = time.perf_counter()
+    info, status = client.call_many([('user.info', {'handles': 'tourist'}), ('user.status', {'handle': 'tourist'})])
+    assert time.perf_counter() - start < 0.35
+    assert info['result'][0]['handle'] == 'tourist'
+    assert status == {'status': 'OK', 'result': []}
+    assert sorted(method for method, _ in transport.calls) == ['user.info', 'user.status']
+
+
+def test_problemset_index_loads_through_client(problems):
+    transport = FakeTransport({'problemset.problems': {'status': 'OK', 'result': {'problems': problems}}})
+    index = ProblemsetIndex(client=CodeforcesClient(transport=transport))
+    index.ensure_loaded()
+    index.ensure_loaded()
+    assert len(transport.calls) == 1
+    assert len(index.by_tag('dp', 800, 3500)) == 3
+
+
+def test_problemset_snapshot_serves_cold_index_without_network(problems, tmp_path):
+    path = str(tmp_path / 'problemset.snapshot')
+    statistics = [{'contestId': 1, 'index': 'A', 'solvedCount': 42}]
+    transport = FakeTransport({'problemset.problems': {
+        'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}})
+    ProblemsetIndex(client=CodeforcesClient(transport=transport), snapshot_path=path).ensure_loaded()
+
+    offline = FakeTransport({})
+    index = ProblemsetIndex(client=CodeforcesClient(transport=offline), snapshot_path=path)
+    assert index.load_snapshot()
+    index.ensure_loaded()
+    assert offline.calls == []
+    assert [p['index'] for p in index.by_tag('dp', 800, 3500)] == ['B', 'A', 'C']
+    assert index.by_tag('math', 800, 800)[0].to_dict() == problems[0]
+    assert index.solved_counts == {(1, 'A'): 42}
+    assert not ProblemsetIndex(snapshot_path=str(tmp_path / 'missing')).load_snapshot()
+
+
+def test_problemset_cold_load_prefers_newer_snapshot(problems, tmp_path):
+    data_dir, bundled = str(tmp_path / 'data.snapshot'), str(tmp_path / 'bundled.snapshot')
+    rated = [problem for problem in problems if 'rating' in problem]
+    write_snapshot(data_dir, rated[:1], created=time.time() - 7200)
+    write_snapshot(bundled, rated, created=time.time() - 60)
+    offline = FakeTransport({})
+    index = ProblemsetIndex(client=CodeforcesClient(transport=offline), ttl=3600,
+                            snapshot_path=data_dir, bundled_snapshot_path=bundled)
+    index.ensure_loaded()
+    assert offline.calls == [] and len(index.by_tag('dp', 800, 3500)) == 3
+
+    write_snapshot(data_dir, rated[:2])
+    assert index.newest_snapshot() == data_dir
+    assert ProblemsetIndex(bundled_snapshot_path=bundled).newest_snapshot() == bundled
+
+
+def test_problemset_statistics_built_on_refresh(problems):
+    statistics = [{'contestId': 1, 'index': 'A', 'solvedCount': 900}, {'contestId': 2, 'index': 'A', 'solvedCount': 50},
+                  {'contestId': 3, 'index': 'B', 'solvedCount': 300}, {'contestId': 4, 'index': 'C', 'solvedCount': 50}]
+    transport = FakeTransport({'problemset.problems': {
+        'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}})
+    index = ProblemsetIndex(client=CodeforcesClient(transport=transport))
+    assert index.statistics.difficulty('dp') == 3
+    index.refresh()
+
+    dp = index.statistics.tag('DP')
+    assert dp['problems'] == 3 and dp['total_solved'] == 400
+    assert dp['rating_percentiles'][50] == 1500 and dp['solved_percentiles'][90] == 300
+    assert [index.statistics.difficulty(tag) for tag in ('greedy', 'math', 'dp')] == [1, 2, 4]
+    assert index.statistics.tag('math')['popularity_rank'] == 1
+    assert [index.statistics.rank(p) for p in problems[:4]] == [1, 3, 2, 3]
+
+
+def test_recommender_skips_solved_and_ranks_by_rating_and_weakness():
+    index = ProblemsetIndex()
+    index.update([
+        make_problem(1, 'A', 1500, ['dp']),
+        make_problem(2, 'A', 1600, ['dp']),
+        make_problem(3, 'A', 1600, ['dp', 'graphs']),
+        make_problem(4, 'A', 2400, ['dp']),
+        make_problem(5, 'A', 1000, ['dp']),
+    ])
+    state = AnalysisState().fold([
+        {'id': 1, 'creationTimeSeconds': int(time.time()), 'verdict': 'OK', 'problem': make_problem(2, 'A', 1600, ['dp'])},
+    ])
+    state = AnalysisState.from_dict(state.to_dict())
+    assert state.solved == {'2_A'}
+
+    topics = {'dp': {'solved': 3, 'attempted': 1}, 'graphs': {'solved': 0, 'attempted': 4}}
+    recommender = ProblemRecommender(index, 1500, state.solved, ProblemRecommender.weakness_from_topics(topics))
+    assert recommender.is_solved(make_problem(2, 'A', 1600, ['dp']))
+    assert [p['contestId'] for p in recommender.top('dp', 800, 3500, 3)] == [3, 1, 5]
+    assert [p['contestId'] for p in ProblemRecommender(index, 1500).top('dp', 800, 3500, 2)] == [2, 3]
+
+
+def test_topic_registry_resolves_aliases_and_resources():
+    registry = TopicRegistry({
+        'default_resources': [['Handbook', 'https://cses.fi/book/book.pdf']],
+        'topics': {
+            'dp': {'difficulty': 4, 'aliases': ['Dynamic Programming'], 'resources': [['AtCoder DP', 'https://atcoder.jp/contests/dp']]},
+            '*special problems': {'excluded': True},
+        },
+    })
+    assert registry.canonical('DP') == registry.canonical('dynamic programming') == 'dp'
+    assert registry.resources('Dynamic Programming') == [('AtCoder DP', 'https://atcoder.jp/contests/dp')]
+    assert registry.difficulty('dp') == 4 and registry.difficulty('Geometry') == 3
+    assert registry.resources('geometry') == [('Handbook', 'https://cses.fi/book/book.pdf')]
+    assert registry.topic_id('Geometry') == registry.topic_id('geometry')
+    assert registry.is_excluded('*Special Problems') and not registry.is_excluded('dp')
+    assert CodeforcesService.get_cp_resources('DP') == topic_registry.resources('dp')
+
+
+def test_client_coalesces_identical_calls():
+    transport = FakeTransport({'problemset.problems': {'status': 'OK', 'result': {'problems': []}}}, latency=0.2)
+    client = CodeforcesClient(transport=transport)
+    results = client.call_many([('problemset.problems', {})] * 5)
+    assert all(r['status'] == 'OK' for r in results)
+    assert len(transport.calls) == 1
+    assert client.metrics()['coalesced'] == 4
+
+
+def test_client_retries_rate_limited_calls():
+    responses = iter([{'status': 'FAILED', 'comment': 'Call limit exceeded'}, {'status': 'OK', 'result': []}])
+    transport = FakeTransport({'user.status': lambda params: next(responses)})
+    client = CodeforcesClient(transport=transport, backoff=0)
+    assert client.call('user.status', handle='tourist')['status'] == 'OK'
+    assert client.metrics()['retries'] == 1
+
+
+def test_client_retry_budget_is_bounded():
+    transport = FakeTransport({'user.status': {'status': 'FAILED', 'comment': 'Call limit exceeded'}})
+    client = CodeforcesClient(transport=transport, backoff=0, max_attempts=10,
+                              retry_budget=RetryBudget(ratio=0, initial=2))
+    with pytest.raises(CodeforcesError):
+        client.call('user.status', handle='tourist')
+    assert len(transport.calls) == 3
+
+
+def test_token_bucket_shared_through_file(tmp_path):
+    path = str(tmp_path / 'bucket')
+    first, second = TokenBucket(rate=10, burst=1, path=path), TokenBucket(rate=10, burst=1, path=path)
+    assert first.acquire() < 0.05
+    assert second.acquire() >= 0.05
+    assert second.metrics()['acquired'] == 1
+
+
+def test_cost_ledger_prices_hits_and_misses():
+    ledger = CostLedger(hit_cost=1, miss_cost=4)
+    assert ledger.charge(hits=3, misses=0) == 3
+    assert ledger.charge(hits=1, misses=2) == 9
+    assert ledger.metrics() == {'hit_requests': 4, 'miss_requests': 2, 'hit_units': 4, 'miss_units': 8}
+
+
+def make_submission(sub_id, verdict='OK'):
+    return {'id': sub_id, 'creationTimeSeconds': 1700000000 + sub_id, 'verdict': verdict,
+            'problem': {'contestId': sub_id, 'index': 'A', 'tags': ['dp']}}
+
+
+def test_submission_store_syncs_incrementally(tmp_path):
+    history = [make_submission(i) for i in range(250, 0, -1)]
+    transport = FakeTransport({'user.status': lambda params: {
+        'status': 'OK',
+        'result': history[params['from'] - 1:params['from'] - 1 + params['count']] if 'from' in params else history
+    }})
+    store = SubmissionStore(CodeforcesClient(transport=transport), str(tmp_path / 'subs.db'), page_size=100)
+
+    assert len(store.sync('Tourist')) == 250
+    assert len(transport.calls) == 1
+
+    history[:0] = [make_submission(252, verdict='TESTING'), make_submission(251)]
+    assert [s['id'] for s in store.sync('tourist')] == [252, 251]
+    assert transport.calls[-1][1] == {'handle': 'tourist', 'from': 1, 'count': 100}
+    final, pending = store.final_since('tourist', 249)
+    assert [s['id'] for s in final] == [250, 251] and [s['id'] for s in pending] == [252]
+
+    history[0] = make_submission(252)
+    assert [s['id'] for s in store.sync('tourist')] == [252]
+    loaded = store.load('TOURIST')
+    assert len(loaded) == 252
+    assert loaded[0].to_dict() == make_submission(252)
+
+
+def test_analysis_state_aggregates():
+    now = int(time.time())
+    submissions = [
+        {'creationTimeSeconds': now - 10, 'verdict': 'OK', 'problem': {'contestId': 1, 'index': 'A', 'tags': ['dp', 'math']}},
+        {'creationTimeSeconds': now - 20, 'verdict': 'WRONG_ANSWER', 'problem': {'contestId': 1, 'index': 'A', 'tags': ['dp', 'math']}},
+        {'creationTimeSeconds': now - 30, 'problem': {'contestId': 2, 'index': 'B', 'tags': ['greedy']}},
+        {'creationTimeSeconds': now - 200 * 86400, 'verdict': 'OK', 'problem': {'index': 'C'}},
+    ]
+    state = AnalysisState().fold(submissions)
+    assert state.analyze_submissions() == {
+        'dp': {'solved': 1, 'attempted': 1},
+        'math': {'solved': 1, 'attempted': 1},
+        'greedy': {'solved': 0, 'attempted': 1},
+    }
+    activity = state.analyze_monthly_activity()
+    assert len(activity['labels']) == 91 and activity['total_solved'] == 1
+    assert state.calculate_statistics() == {
+        'total_solved': 1, 'avg_attempts': 1.5, 'success_rate': 50.0,
+        'total_problems_attempted': 2, 'total_attempts': 3
+    }
+
+
+def test_analysis_state_folds_incrementally():
+    now = int(time.time())
+    day = 86400
+    old = [
+        {'id': 1, 'creationTimeSeconds': now - 95 * day, 'verdict': 'OK', 'problem': {'contestId': 1, 'index': 'A', 'tags': ['dp']}},
+        {'id': 2, 'creationTimeSeconds': now - 10 * day, 'verdict': 'WRONG_ANSWER', 'problem': {'contestId': 2, 'index': 'A', 'tags': ['math']}},
+    ]
+    new = [
+        {'id': 3, 'creationTimeSeconds': now - 5, 'verdict': 'OK', 'problem': {'contestId': 2, 'index': 'A', 'tags': ['math']}},
+    ]
+    state = AnalysisState.from_dict(AnalysisState().fold(old).to_dict()).fold(new)
+    assert state.last_id == 3
+    assert state.analyze_submissions() == AnalysisState().fold(old + new).analyze_submissions()
+    assert state.calculate_statistics() == {
+        'total_solved': 1, 'avg_attempts': 2.0, 'success_rate': 100.0,
+        'total_problems_attempted': 1, 'total_attempts': 2
+    }
+    assert state.analyze_monthly_activity()['values'][-1] == 1
+
+    state.expire(today=AnalysisState.today() + 85)
+    assert state.calculate_statistics()['total_attempts'] == 1
+
+
+def test_activity_rollup_range_queries():
+    first = date(2023, 12, 25).toordinal()
+    days = {first: 2, first + 3: 1, first + 10: 4, first + 40: 5}
+    rollup = ActivityRollup(days)
+    assert rollup.total(first - 100, first + 1000) == 12
+    assert rollup.total(first + 1, first + 10) == 5
+    assert rollup.total(first + 41, first + 50) == 0
+
+    weeks = rollup.query(first, first + 14, 'week')
+    assert [(b['start'], b['count']) for b in weeks['buckets']] == [
+        ('2023-12-25', 3), ('2024-01-01', 4), ('2024-01-08', 0)]
+    months = rollup.query(first + 1, first + 40, 'month')
+    assert [(b['start'], b['count']) for b in months['buckets']] == [('2023-12-26', 1), ('2024-01-01', 4), ('2024-02-01', 5)]
+    daily = rollup.query(first - 2, first + 1)
+    assert [b['count'] for b in daily['buckets']] == [0, 0, 2, 0] and daily['total'] == 2
+    assert ActivityRollup({}).query(first, first, 'month')['total'] == 0
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), threshold=2)
+    cache.set('a', {'payload': 'x' * 4096})
+    cache.set('b', 2)
+    assert cache.get('a') == {'payload': 'x' * 4096}
+    time.sleep(0.01)
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') == 3
+    assert cache.add('c', 4) is False
+    cache.set('d', 5, timeout=-1)
+    assert cache.get('d') is None
+
+
+def test_sqlite_cache_through_flask_caching(tmp_path):
+    from flask import Flask
+    from flask_caching import Cache
+
+    app = Flask(__name__)
+    cache = Cache(config={'CACHE_TYPE': 'src.cache.SQLiteCache', 'CACHE_SQLITE_PATH': str(tmp_path / 'cache.db'),
+                          'CACHE_THRESHOLD': 2, 'CACHE_DEFAULT_TIMEOUT': 60})
+    cache.init_app(app)
+    with app.app_context():
+        assert isinstance(cache.cache, SQLiteCache) and cache.cache.threshold == 2
+        cache.set('a', 1)
+        cache.set('a', 2)
+        cache.set('b', 3)
+        assert cache.get('a') == 2 and cache.get('b') == 3
+        cache.set('c', 4)
+        assert cache.get('a') is None and cache.get('c') == 4
+
+
+def test_sqlite_limiter_storage_shares_counters(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    first, second = SQLiteStorage(uri), SQLiteStorage(uri)
+    assert first.incr('ip', 60) == 1
+    assert second.incr('ip', 60, amount=2) == 3
+    assert first.get('ip') == 3
+    second.clear('ip')
+    assert first.get('ip') == 0
+
+
+def test_load_stream_projects_records_across_chunk_boundaries():
+    body = json.dumps({'status': 'OK', 'result': [
+        {'id': 10, 'creationTimeSeconds': 1700000000, 'verdict': 'OK', 'memoryConsumedBytes': 123456,
+         'author': {'members': [{'handle': 'tourist'}]}, 'programmingLanguage': 'GNU C++17',
+         'problem': {'contestId': 1, 'index': 'A', 'name': 'Ä', 'rating': 800, 'tags': ['math'], 'points': 500.0}},
+        {'id': 9, 'creationTimeSeconds': 1699999999, 'problem': {'contestId': 1, 'index': 'B', 'tags': []}},
+    ]}).encode()
+    for size in (1, 7, len(body)):
+        response = load_stream((body[i:i + size] for i in range(0, len(body), size)), USER_STATUS_SCHEMA)
+        assert response['status'] == 'OK'
+        first, second = response['result']
+        assert isinstance(first, Submission) and isinstance(first['problem'], Problem)
+        assert first.to_dict() == {'id': 10, 'creationTimeSeconds': 1700000000, 'verdict': 'OK',
+                                   'problem': {'contestId': 1, 'index': 'A', 'name': 'Ä', 'rating': 800, 'tags': ['math']}}
+        assert 'verdict' not in second and second.get('verdict') is None
+        assert second['problem']['tags'] == []
+
+
+def test_load_stream_problemset_schema():
+    body = json.dumps({'status': 'OK', 'result': {
+        'problems': [{'contestId': 1, 'index': 'A', 'name': 'x', 'type': 'PROGRAMMING', 'rating': 800, 'tags': []}],
+        'problemStatistics': [{'contestId': 1, 'index': 'A', 'solvedCount': 12345}],
+    }}).encode()
+    response = load_stream([body[:20], body[20:]], PROBLEMSET_SCHEMA)
+    assert response['result']['problems'][0].to_dict() == {'contestId': 1, 'index': 'A', 'name': 'x', 'rating': 800, 'tags': []}
+    assert response['result']['problemStatistics'][0]['solvedCount'] == 12345
+    failed = load_stream([b'{"status":"FAILED","comment":"handle: not found"}'], USER_STATUS_SCHEMA)
+    assert failed == {'status': 'FAILED', 'comment': 'handle: not found'}
+
+
+def test_tracer_histograms_render_as_prometheus_text():
+    tracer = Tracer(enabled=True)
+    traced = tracer.traced('work')(lambda x: x * 2)
+    assert traced(21) == 42
+    with tracer.span('work'):
+        pass
+    tracer.observe('slow', 100)
+    text = tracer.render_prometheus({'queue_depth': 3}, {'requests': 5, 'wait_seconds_total': 1.5})
+    assert 'codeforces_planner_span_seconds_count{span="work"} 2' in text
+    assert 'codeforces_planner_span_seconds_bucket{span="slow",le="30.0"} 0' in text
+    assert 'codeforces_planner_span_seconds_bucket{span="slow",le="+Inf"} 1' in text
+    assert 'codeforces_planner_queue_depth 3' in text
+    assert '# TYPE codeforces_planner_requests_total counter\ncodeforces_planner_requests_total 5' in text
+    assert '# TYPE codeforces_planner_wait_seconds_total counter\ncodeforces_planner_wait_seconds_total 1.5' in text
+
+
+def test_disabled_tracer_is_a_no_op():
+    tracer = Tracer(enabled=False)
+    fn = lambda: None
+    assert tracer.traced('x')(fn) is fn
+    with tracer.span('x'):
+        pass
+    assert tracer.histograms == {}
+
+
+def test_sampling_profiler_collects_stacks():
+    def busy_wait():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_wait()
+    assert 'busy_wait' in profiler.stop().collapsed()
+
+
+def test_get_users_info_batches_and_skips_unknown_handles(monkeypatch):
+    known = {'tourist': 3800, 'petr': 2900}
+
+    def user_info(params):
+        handles = params['handles'].split(';')
+        for handle in handles:
+            if handle not in known:
+                return {'status': 'FAILED', 'comment': f'handles: User with handle {handle} not found'}
+        return {'status': 'OK', 'result': [{'handle': h.capitalize(), 'rating': known[h]} for h in handles]}
+
+    transport = FakeTransport({'user.info': user_info})
+    monkeypatch.setattr(CodeforcesService, 'client', CodeforcesClient(transport=transport))
+    users = CodeforcesService.get_users_info(['Tourist', 'nobody', 'petr', 'tourist '])
+    assert users == {'tourist': {'handle': 'Tourist', 'rating': 3800}, 'petr': {'handle': 'Petr', 'rating': 2900}}
+    assert [params['handles'] for _, params in transport.calls] == ['tourist;nobody;petr', 'tourist;petr']
+
+
+def test_rating_state_extends_incrementally(monkeypatch, tmp_path):
+    history = [
+        {'contestId': 10, 'contestName': 'Round 10', 'rank': 900, 'ratingUpdateTimeSeconds': 1000, 'oldRating': 0, 'newRating': 1400},
+        {'contestId': 11, 'contestName': 'Round 11', 'rank': 500, 'ratingUpdateTimeSeconds': 2000, 'oldRating': 1400, 'newRating': 1500},
+        {'contestId': 12, 'contestName': 'Round 12', 'rank': 800, 'ratingUpdateTimeSeconds': 3000, 'oldRating': 1500, 'newRating': 1450},
+    ]
+    submissions = [
+        {'id': 3, 'contestId': 11, 'creationTimeSeconds': 1500, 'relativeTimeSeconds': 3000, 'verdict': 'OK',
+         'problem': {'contestId': 11, 'index': 'B', 'tags': []}},
+        {'id': 2, 'contestId': 11, 'creationTimeSeconds': 1400, 'relativeTimeSeconds': 600, 'verdict': 'OK',
+         'problem': {'contestId': 11, 'index': 'A', 'tags': []}},
+        {'id': 1, 'contestId': 11, 'creationTimeSeconds': 1300, 'relativeTimeSeconds': 2147483647, 'verdict': 'OK',
+         'problem': {'contestId': 11, 'index': 'C', 'tags': []}},
+    ]
+    rated = history[:2]
+    transport = FakeTransport({
+        'user.rating': lambda params: {'status': 'OK', 'result': rated},
+        'user.status': lambda params: {'status': 'OK', 'result': submissions},
+    })
+    client = CodeforcesClient(transport=transport)
+    monkeypatch.setattr(CodeforcesService, 'client', client)
+    monkeypatch.setattr(CodeforcesService, 'submission_store', SubmissionStore(client, str(tmp_path / 'subs.db')))
+
+    assert len(CodeforcesService.get_user_rating_state('tourist')) == 2
+    rated = history
+    state = CodeforcesService.get_user_rating_state('tourist')
+    result = state.analyze(window=2)
+    assert [c['delta'] for c in result['contests']] == [1400, 100, -50]
+    assert result['moving_average'] == [1400.0, 1450.0, 1475.0]
+    assert result['volatility'] == [0.0, 650.0, 75.0]
+    assert result['solve_times']['11'] == {'solved': 2, 'minutes': [10, 50], 'median_minutes': 50}
+    assert result['max_rating'] == 1500
+    assert RatingState.from_dict(state.to_dict()).analyze(window=2) == result
+
+
+def test_lazy_singleton_builds_once_under_concurrent_first_calls():
+    built = []
+    start = threading.Barrier(8)
+
+    @lazy_singleton
+    def get_service(name):
+        time.sleep(0.01)
+        built.append(name)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: start.wait() or results.append(get_service('jobs'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == ['jobs'] and len(set(map(id, results))) == 1
+    assert get_service('batch') is not results[0] and list(get_service.instances) == [('jobs',), ('batch',)]
+
+
+def test_job_queue_deduplicates_and_completes(tmp_path):
+    release = threading.Event()
+    handled = []
+
+    def handler(handle):
+        release.wait(5)
+        handled.append(handle)
+        return ({'handle': handle}, None) if handle != 'nobody' else (None, 'Invalid Codeforces username')
+
+    queue = JobQueue(str(tmp_path / 'jobs.db'), handler, workers=1, poll_interval=0.01)
+    first, created = queue.submit('tourist')
+    assert created and queue.submit('tourist') == (first, False)
+    failed, _ = queue.submit('nobody')
+    release.set()
+    deadline = time.time() + 5
+    while time.time() < deadline and queue.get(failed)['status'] != 'failed':
+        time.sleep(0.01)
+    assert queue.get(first)['status'] == 'done'
+    assert queue.get(first)['result'] == {'handle': 'tourist'}
+    assert queue.get(failed)['error'] == 'Invalid Codeforces username'
+    assert handled == ['tourist', 'nobody']
+    assert queue.submit('tourist')[0] != first
+
+
+def test_analysis_result_preencodes_payloads():
+    data = {'user_info': {'handle': 'tourist'}, 'topics': {'dp': {'solved': 1, 'attempted': 0}},
+            'monthly_activity': {'labels': [], 'values': [], 'total_solved': 0}, 'statistics': {},
+            'training_path': [], 'recommendations': ['Great job!']}
+    result = AnalysisResult(data).prepare()
+    assert json.loads(result.analyze.identity) == data
+    assert json.loads(gzip.decompress(result.download.gzip)) == {k: v for k, v in data.items() if k != 'monthly_activity'}
+    assert result.analyze.etag == AnalysisResult(dict(data)).prepare().analyze.etag
+    assert result.analyze.etag != result.download.etag
+
+    bodies = result.bodies()
+    assert bodies['analyze', None] == result.analyze.identity and bodies['download', 'gzip'] == result.download.gzip
+    entry = pickle.loads(pickle.dumps(result.entry()))
+    assert entry.etags == {'analyze': result.analyze.etag, 'download': result.download.etag}
+    assert negotiate(entry.encodings, {'gzip': 1, 'br': 0}) == 'gzip'
+    assert negotiate(entry.encodings, {'gzip': 0, 'br': 0}) is None
+    assert negotiate((None, 'gzip'), {'gzip': 1, 'br': 1}) == 'gzip'